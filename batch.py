@@ -0,0 +1,212 @@
+import argparse
+import json
+import os
+import re
+
+from utils.data_cache import load_transactions
+from utils.file_handler import save_rejected_lines
+from utils.indexes import TransactionIndex
+from utils.report import REPORT_FORMATS
+from utils.data_processor import (
+    validate_and_filter,
+    aggregate_sales,
+    aggregate_sales_parallel,
+    generate_sales_report
+)
+from utils.api_handler import (
+    load_product_catalog,
+    create_product_mapping,
+    enrich_sales_data
+)
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+
+QUERY_FIELDS = ['region', 'min_amount', 'max_amount', 'start_date', 'end_date']
+
+
+def parse_query(text):
+    # "name=north_big,region=North,min_amount=1000" -> query dict
+    query = {}
+    for part in text.split(','):
+        if not part.strip():
+            continue
+        key, sep, value = part.partition('=')
+        key = key.strip()
+        if not sep or key not in QUERY_FIELDS + ['name']:
+            raise ValueError(f"Invalid query field: {part.strip()}")
+        query[key] = value.strip()
+    return query
+
+
+def load_queries(filename):
+    # A JSON (or YAML, when PyYAML is installed) list of query objects, or
+    # an object with a "queries" list.
+    with open(filename, encoding='utf-8') as file:
+        if filename.endswith(('.yaml', '.yml')):
+            if yaml is None:
+                raise ValueError("PyYAML is required to read YAML query files")
+            specs = yaml.safe_load(file)
+        else:
+            specs = json.load(file)
+
+    if isinstance(specs, dict):
+        specs = specs.get('queries', [])
+    return list(specs or [])
+
+
+def normalize_query(query, position):
+    unknown = set(query) - set(QUERY_FIELDS) - {'name'}
+    if unknown:
+        raise ValueError(f"Invalid query field: {', '.join(sorted(unknown))}")
+
+    normalized = {'name': str(query.get('name') or f"query_{position}")}
+    for field in QUERY_FIELDS:
+        value = query.get(field)
+        if value in (None, ''):
+            value = None
+        elif field in ('min_amount', 'max_amount'):
+            value = float(value)
+        else:
+            value = str(value)
+        normalized[field] = value
+    return normalized
+
+
+def report_filename(output_dir, name, report_format='text'):
+    safe_name = re.sub(r'[^A-Za-z0-9_.-]+', '_', name).strip('._') or 'query'
+    extension = 'txt' if report_format == 'text' else report_format
+    return os.path.join(output_dir, f"{safe_name}.{extension}")
+
+
+def report_filenames(queries, output_dir, report_format='text'):
+    # One report file per query; names that sanitize to the same file
+    # would overwrite each other, so they are rejected.
+    filenames = []
+    seen = {}
+    for query in queries:
+        filename = report_filename(output_dir, query['name'], report_format)
+        if filename in seen:
+            raise ValueError(
+                f"Queries '{seen[filename]}' and '{query['name']}' would both write {filename}"
+            )
+        seen[filename] = query['name']
+        filenames.append(filename)
+    return filenames
+
+
+def run_batch(queries, sales_file='data/sales_data.txt', output_dir='output/batch',
+              workers=1, ingest='stream', distinct='exact', report_format='text', analytics_workers=1,
+              rejected_file=None):
+    # Reads, validates and enriches once, then each query is an index
+    # lookup plus aggregation over the shared enriched table.
+    output_files = report_filenames(queries, output_dir, report_format)
+
+    rejected = [] if rejected_file else None
+    transactions = load_transactions(sales_file, workers=workers, ingest=ingest, rejected=rejected)
+    print(f"• Parsed {len(transactions)} records")
+    if rejected is not None:
+        save_rejected_lines(rejected, rejected_file)
+        print(f"• {len(rejected)} rejected lines saved to: {rejected_file}")
+
+    valid_transactions, invalid_count, summary = validate_and_filter(transactions, verbose=False)
+    print(f"• Valid: {summary['final_count']} | Invalid: {invalid_count}")
+
+    api_products = load_product_catalog()
+    product_mapping = create_product_mapping(api_products)
+    enriched_transactions = enrich_sales_data(valid_transactions, product_mapping)
+    print("• Enriched data saved to: data/enriched_sales_data.txt")
+
+    index = TransactionIndex(enriched_transactions, invalid_count, summary['total_input'])
+    os.makedirs(output_dir, exist_ok=True)
+
+    results = []
+    for query, output_file in zip(queries, output_files):
+        filtered, _, query_summary = index.filter(
+            query['region'],
+            query['min_amount'],
+            query['max_amount'],
+            query['start_date'],
+            query['end_date'],
+            verbose=False
+        )
+
+        if analytics_workers > 1:
+            aggregates = aggregate_sales_parallel(filtered, workers=analytics_workers, distinct=distinct)
+        else:
+            aggregates = aggregate_sales(filtered, distinct=distinct)
+        generate_sales_report(
+            filtered, filtered, output_file=output_file, aggregates=aggregates, output_format=report_format
+        )
+
+        print(f"• {query['name']}: {query_summary['final_count']} records -> {output_file}")
+        results.append({'query': query, 'summary': query_summary, 'report': output_file})
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run several sales report queries over one loaded dataset."
+    )
+    parser.add_argument(
+        '-q', '--query', action='append', default=[],
+        help="Filter spec, e.g. name=north,region=North,min_amount=1000,start_date=2024-12-01"
+    )
+    parser.add_argument(
+        '-f', '--queries-file',
+        help="JSON or YAML file with a list of query objects"
+    )
+    parser.add_argument('--sales-file', default='data/sales_data.txt')
+    parser.add_argument('--output-dir', default='output/batch')
+    parser.add_argument('--workers', type=int, default=1, help="Processes used to parse the sales file")
+    parser.add_argument(
+        '--analytics-workers', type=int, default=1,
+        help="Processes used to aggregate each query (partitioned map-reduce when above 1)"
+    )
+    parser.add_argument('--ingest', choices=['stream', 'mmap'], default='stream')
+    parser.add_argument('--distinct', choices=['exact', 'hll'], default='exact')
+    parser.add_argument('--report-format', choices=REPORT_FORMATS, default='text')
+    parser.add_argument('--rejected-file', help="Write lines the parser dropped, with the reason, to this file")
+    args = parser.parse_args(argv)
+
+    try:
+        specs = load_queries(args.queries_file) if args.queries_file else []
+        specs += [parse_query(text) for text in args.query]
+        if not specs:
+            # No filters given: a single report over all valid transactions.
+            specs = [{'name': 'all'}]
+        queries = [normalize_query(spec, i + 1) for i, spec in enumerate(specs)]
+        report_filenames(queries, args.output_dir, args.report_format)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    print("=" * 70)
+    print("SALES ANALYTICS SYSTEM - BATCH")
+    print("=" * 70)
+
+    try:
+        run_batch(
+            queries,
+            sales_file=args.sales_file,
+            output_dir=args.output_dir,
+            workers=args.workers,
+            ingest=args.ingest,
+            distinct=args.distinct,
+            report_format=args.report_format,
+            analytics_workers=args.analytics_workers,
+            rejected_file=args.rejected_file
+        )
+        print("=" * 70)
+
+    except Exception as e:
+        print("An error occurred during execution.")
+        print("Error details:", e)
+        print("The program exited safely without crashing.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import argparse
+import random
+
+
+HEADER = 'TransactionID|Date|ProductID|ProductName|Quantity|UnitPrice|CustomerID|Region'
+
+REGIONS = ['North', 'South', 'East', 'West']
+
+# (ProductID, ProductName, low price, high price) as in data/sales_data.txt;
+# generated products are added after these.
+BASE_PRODUCTS = [
+    ('P101', 'Laptop', 40000, 90000),
+    ('P102', 'Mouse', 300, 1200),
+    ('P103', 'Keyboard', 800, 3000),
+    ('P104', 'Monitor', 7000, 20000),
+    ('P105', 'Webcam', 1500, 5000),
+    ('P106', 'Headphones', 1000, 4000),
+    ('P107', 'USB Cable', 150, 500),
+    ('P108', 'External Hard Drive', 3000, 8000),
+    ('P109', 'Wireless Mouse', 500, 2000),
+    ('P110', 'Laptop Charger', 1500, 3000)
+]
+
+# Share of rows given each kind of mess that parse_transactions or
+# validate_and_filter has to deal with.
+MESS_RATES = {
+    'thousands_separator': 0.15,   # 1,916 in UnitPrice (when it is 1000 or more)
+    'comma_in_name': 0.10,         # Mouse,Wireless
+    'zero_quantity': 0.02,
+    'negative_quantity': 0.01,
+    'negative_price': 0.02,
+    'bad_field_count': 0.02,       # a field missing or an extra '|'
+    'bad_number': 0.005,           # quantity that is not a number
+    'bad_id': 0.01,                # TransactionID/ProductID/CustomerID prefix
+    'missing_field': 0.01          # empty CustomerID or Region
+}
+
+
+def make_products(count):
+    products = list(BASE_PRODUCTS[:count])
+    for number in range(111, 101 + count):
+        low = random.Random(number).randint(100, 20000)
+        products.append((f"P{number}", f"Item {number}", low, low * 3))
+    return products
+
+
+def generate_lines(rows, seed=42, products=200, customers=5000, year=2024):
+    # Yields data lines (no header). Same seed, same lines.
+    rng = random.Random(seed)
+    catalog = make_products(products)
+    mess = list(MESS_RATES.items())
+
+    for i in range(1, rows + 1):
+        product_id, name, low, high = rng.choice(catalog)
+        quantity = rng.randint(1, 10)
+        unit_price = rng.randint(low, high)
+        transaction_id = f"T{i:07d}"
+        customer_id = f"C{rng.randint(1, customers):04d}"
+        region = rng.choice(REGIONS)
+        date = f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+
+        quantity_text = str(quantity)
+        price_text = str(unit_price)
+        bad_field_count = False
+
+        for kind, rate in mess:
+            if rng.random() >= rate:
+                continue
+            if kind == 'thousands_separator':
+                price_text = f"{unit_price:,}"
+            elif kind == 'comma_in_name':
+                words = name.split(' ')
+                name = ','.join(words) if len(words) > 1 else name + ',Premium'
+            elif kind == 'zero_quantity':
+                quantity_text = '0'
+            elif kind == 'negative_quantity':
+                quantity_text = str(-quantity)
+            elif kind == 'negative_price':
+                price_text = str(-unit_price)
+            elif kind == 'bad_field_count':
+                bad_field_count = True
+            elif kind == 'bad_number':
+                quantity_text = rng.choice(['', 'two', '1.5'])
+            elif kind == 'bad_id':
+                field = rng.randrange(3)
+                if field == 0:
+                    transaction_id = 'X' + transaction_id[1:]
+                elif field == 1:
+                    product_id = 'Q' + product_id[1:]
+                else:
+                    customer_id = 'D' + customer_id[1:]
+            elif kind == 'missing_field':
+                if rng.random() < 0.5:
+                    customer_id = ''
+                else:
+                    region = ''
+
+        fields = [transaction_id, date, product_id, name, quantity_text, price_text, customer_id, region]
+        if bad_field_count:
+            if rng.random() < 0.5:
+                del fields[rng.randrange(len(fields))]
+            else:
+                fields.insert(rng.randrange(len(fields)), 'extra')
+
+        yield '|'.join(fields)
+
+
+def generate_sales_data(filename, rows, seed=42, products=200, customers=5000, batch_size=100000):
+    with open(filename, 'w', encoding='utf-8', newline='\n') as file:
+        file.write(HEADER + '\n')
+        batch = []
+        for line in generate_lines(rows, seed, products, customers):
+            batch.append(line)
+            if len(batch) >= batch_size:
+                file.write('\n'.join(batch) + '\n')
+                batch = []
+        if batch:
+            file.write('\n'.join(batch) + '\n')
+
+
+def catalog_products(products=200):
+    # DummyJSON-shaped products for the generated ProductIDs, so enrichment
+    # can be benchmarked without the network.
+    return [
+        {
+            'id': int(product_id[1:]),
+            'title': name,
+            'category': 'electronics',
+            'brand': f"Brand {int(product_id[1:]) % 17}",
+            'rating': round(3 + (int(product_id[1:]) % 20) / 10, 1)
+        }
+        for product_id, name, _, _ in make_products(products)
+    ]
+
+
+def parse_size(text):
+    # "10000", "10K", "1M", "10M" -> int
+    text = text.strip().upper().replace('_', '')
+    multiplier = {'K': 1000, 'M': 1000000}.get(text[-1:], 1)
+    if multiplier > 1:
+        text = text[:-1]
+    return int(float(text) * multiplier)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic, messy sales_data.txt file.")
+    parser.add_argument('output', help="File to write, e.g. data/sales_data_1m.txt")
+    parser.add_argument('--rows', type=parse_size, default=10000, help="Data rows, e.g. 10K, 1M, 10M")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--customers', type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    generate_sales_data(args.output, args.rows, args.seed, args.products, args.customers)
+    print(f"Wrote {args.rows} rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
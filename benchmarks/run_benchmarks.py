@@ -0,0 +1,209 @@
+import argparse
+from datetime import datetime
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from benchmarks.generate_sales_data import (
+    generate_sales_data,
+    catalog_products,
+    parse_size
+)
+from utils.file_handler import read_sales_data
+from utils.data_processor import (
+    parse_transactions,
+    parse_transactions_mmap,
+    validate_and_filter,
+    aggregate_sales,
+    aggregate_sales_parallel,
+    calculate_total_revenue,
+    region_wise_sales,
+    top_selling_products,
+    customer_analysis,
+    daily_sales_trend,
+    find_peak_sales_day,
+    low_performing_products,
+    generate_sales_report
+)
+from utils.api_handler import create_product_mapping, enrich_sales_data
+from utils.transaction_table import TransactionTable
+
+
+DEFAULT_SIZES = '10K,1M'
+RESULTS_DIR = 'output/benchmarks'
+
+# The list-of-dicts path (read_sales_data + parse_transactions) holds every
+# line and record in memory; above this many rows it is skipped.
+LIST_PATH_MAX_ROWS = 1000000
+
+
+def max_rss_bytes():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if platform.system() == 'Darwin' else peak * 1024
+
+
+def run_stage(stages, name, func, rows_in, trace_memory=False):
+    if trace_memory:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+
+    stats = {
+        'seconds': round(seconds, 6),
+        'rows_in': rows_in,
+        'rows_per_sec': round(rows_in / seconds, 1) if seconds > 0 else None
+    }
+    if isinstance(result, tuple):
+        stats['rows_out'] = len(result[0])
+    elif isinstance(result, (list, TransactionTable)):
+        stats['rows_out'] = len(result)
+
+    if trace_memory:
+        stats['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    stages[name] = stats
+    print(f"  {name:<24} {seconds:10.3f}s {stats['rows_per_sec'] or 0:14,.0f} rows/s")
+    return result
+
+
+def run_analytics(transactions, aggregates):
+    calculate_total_revenue(transactions, aggregates=aggregates)
+    region_wise_sales(transactions, aggregates=aggregates)
+    top_selling_products(transactions, aggregates=aggregates)
+    customer_analysis(transactions, aggregates=aggregates, top_n=5)
+    daily_sales_trend(transactions, aggregates=aggregates)
+    find_peak_sales_day(transactions, aggregates=aggregates)
+    low_performing_products(transactions, aggregates=aggregates)
+
+
+def benchmark_size(rows, work_dir, seed=42, products=200, trace_memory=False,
+                   list_path_max_rows=LIST_PATH_MAX_ROWS, analytics_workers=1):
+    sales_file = os.path.join(work_dir, f"sales_data_{rows}.txt")
+    generate_sales_data(sales_file, rows, seed=seed, products=products)
+
+    print(f"{rows:,} rows ({os.path.getsize(sales_file):,} bytes)")
+    stages = {}
+    run_start = time.perf_counter()
+
+    if rows <= list_path_max_rows:
+        raw_lines = run_stage(stages, 'read_sales_data', lambda: read_sales_data(sales_file), rows, trace_memory)
+        records = run_stage(stages, 'parse_transactions', lambda: parse_transactions(raw_lines), rows, trace_memory)
+        run_stage(
+            stages, 'validate_and_filter_list',
+            lambda: validate_and_filter(records, verbose=False), len(records), trace_memory
+        )
+        del raw_lines, records
+
+    # The pipeline main.py runs.
+    table = run_stage(stages, 'parse_transactions_mmap', lambda: parse_transactions_mmap(sales_file), rows, trace_memory)
+    valid, _, _ = run_stage(
+        stages, 'validate_and_filter', lambda: validate_and_filter(table, verbose=False), len(table), trace_memory
+    )
+    aggregates = run_stage(stages, 'aggregate_sales', lambda: aggregate_sales(valid), len(valid), trace_memory)
+    if analytics_workers > 1:
+        run_stage(
+            stages, 'aggregate_sales_parallel',
+            lambda: aggregate_sales_parallel(valid, workers=analytics_workers), len(valid), trace_memory
+        )
+    run_stage(stages, 'analytics', lambda: run_analytics(valid, aggregates), len(valid), trace_memory)
+
+    # The synthetic catalog uses the sales ProductID numbers as its ids.
+    product_mapping = create_product_mapping(
+        catalog_products(products), rules=[{'prefix': 'P', 'start': None, 'end': None, 'offset': 0}]
+    )
+    enriched_file = os.path.join(work_dir, 'enriched_sales_data.txt')
+    enriched = run_stage(
+        stages, 'enrich_sales_data',
+        lambda: enrich_sales_data(valid, product_mapping, output_file=enriched_file), len(valid), trace_memory
+    )
+    report_file = os.path.join(work_dir, 'sales_report.txt')
+    run_stage(
+        stages, 'generate_sales_report',
+        lambda: generate_sales_report(valid, enriched, output_file=report_file, aggregates=aggregates),
+        len(valid), trace_memory
+    )
+
+    total_seconds = time.perf_counter() - run_start
+    return {
+        'rows': rows,
+        'file_bytes': os.path.getsize(sales_file),
+        'valid_rows': len(valid),
+        'total_seconds': round(total_seconds, 6),
+        'rows_per_sec': round(rows / total_seconds, 1) if total_seconds > 0 else None,
+        'max_rss_bytes': max_rss_bytes(),
+        'stages': stages
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the sales pipeline on synthetic data.")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="Comma separated row counts, e.g. 10K,1M,10M")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument(
+        '--trace-memory', action='store_true',
+        help="Record per-stage peak memory with tracemalloc (slows every stage down)"
+    )
+    parser.add_argument(
+        '--analytics-workers', type=int, default=1,
+        help="Also time aggregate_sales_parallel with this many processes"
+    )
+    parser.add_argument('--list-path-max-rows', type=parse_size, default=LIST_PATH_MAX_ROWS)
+    parser.add_argument('--work-dir', help="Where generated files go (default: a temporary directory)")
+    parser.add_argument('--output', help=f"JSON results file (default: {RESULTS_DIR}/benchmark_<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(size) for size in args.sizes.split(',') if size.strip()]
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='sales_bench_')
+    os.makedirs(work_dir, exist_ok=True)
+
+    started = datetime.now()
+    results = {
+        'timestamp': started.isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'trace_memory': args.trace_memory,
+        'analytics_workers': args.analytics_workers,
+        'cpu_count': os.cpu_count(),
+        'runs': []
+    }
+
+    try:
+        for rows in sizes:
+            results['runs'].append(benchmark_size(
+                rows, work_dir, seed=args.seed, products=args.products,
+                trace_memory=args.trace_memory, list_path_max_rows=args.list_path_max_rows,
+                analytics_workers=args.analytics_workers
+            ))
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    output_file = args.output or os.path.join(RESULTS_DIR, f"benchmark_{started:%Y%m%d_%H%M%S}.json")
+    if os.path.dirname(output_file):
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+
+    with open(output_file, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2)
+        file.write('\n')
+    print(f"Results written to {output_file}")
+
+
+if __name__ == "__main__":
+    main()
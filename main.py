@@ -1,7 +1,12 @@
-from utils.file_handler import read_sales_data
+from utils.data_cache import load_transactions
+from utils.file_handler import save_rejected_lines
+from utils.incremental import refresh_aggregates
+from utils.profiling import RunProfile
+from utils.report import enrichment_summary
 from utils.data_processor import (
-    parse_transactions,
     validate_and_filter,
+    aggregate_sales,
+    aggregate_sales_parallel,
     calculate_total_revenue,
     region_wise_sales,
     top_selling_products,
@@ -12,103 +17,213 @@ from utils.data_processor import (
     generate_sales_report
 )
 from utils.api_handler import (
-    fetch_all_products,
+    load_product_catalog,
     create_product_mapping,
     enrich_sales_data
 )
 
+# Number of processes used to parse the sales file; 1 parses in-process.
+PARSE_WORKERS = 1
+
+# How a single process reads the file: "stream" decodes text lines,
+# "mmap" scans the raw bytes and decodes only distinct field values.
+INGEST_MODE = "stream"
+
+# Reuse the saved aggregates and fold in only lines appended since the last
+# run. Applies to unfiltered runs; filtered runs aggregate from scratch.
+INCREMENTAL_MODE = True
+
+# Processes used to aggregate filtered or non-incremental runs; above 1 the
+# aggregation is partitioned and merged (same results as the serial pass).
+ANALYTICS_WORKERS = 1
+
+# "exact" counts unique customers/products with sets; "hll" uses fixed-size
+# HyperLogLog sketches (about 1% error for customers per day).
+DISTINCT_COUNT_MODE = "exact"
+
+# "text" writes data/enriched_sales_data.txt; "columnar" writes typed column
+# files to data/enriched_sales_data.cols for downstream jobs.
+ENRICHED_OUTPUT_FORMAT = "text"
+
+# Report format: "text", "json", "csv" or "html".
+REPORT_FORMAT = "text"
+REPORT_FILES = {
+    "text": "output/sales_report.txt",
+    "json": "output/sales_report.json",
+    "csv": "output/sales_report.csv",
+    "html": "output/sales_report.html"
+}
+
+# If set, lines the parser dropped (wrong field count, bad numbers) are
+# written here with the reason, one per line.
+REJECTED_LINES_FILE = None
+
+# Each stage's wall/CPU time and row counts are appended to this JSON lines
+# file (None disables it). PROFILE_MEMORY adds tracemalloc peaks at some
+# cost in speed; CPROFILE_FILE, if set, gets a cProfile dump of the run.
+PROFILE_FILE = "output/run_profile.jsonl"
+PROFILE_MEMORY = False
+CPROFILE_FILE = None
+
 
 def main():
     print("=" * 70)
     print("SALES ANALYTICS SYSTEM")
     print("=" * 70)
 
-    try:
-        # 1. Read sales data
-        print("[1/10] Reading sales data...")
-        raw_lines = read_sales_data("data/sales_data.txt")
-        print(f"• Successfully read {len(raw_lines)} transactions")
-
-        # 2. Parse and clean
-        print("[2/10] Parsing and cleaning data...")
-        transactions = parse_transactions(raw_lines)
-        print(f"• Parsed {len(transactions)} records")
-
-        # 3. Display filter options
-        print("[3/10] Filter Options Available:")
-        _, _, preview_summary = validate_and_filter(transactions)
-        regions = ["North", "South", "East", "West"]
-        print("Regions:", ", ".join(regions))
-        print("Amount Range: Refer above")
-
-        apply_filter = input("Do you want to filter data? (y/n): ").strip().lower()
-
-        region = None
-        min_amount = None
-        max_amount = None
-
-        if apply_filter == "y":
-            region = input("Enter region (or press Enter to skip): ").strip() or None
-
-            min_val = input("Enter minimum transaction amount (or press Enter to skip): ").strip()
-            max_val = input("Enter maximum transaction amount (or press Enter to skip): ").strip()
-
-            min_amount = float(min_val) if min_val else None
-            max_amount = float(max_val) if max_val else None
-
-        # 4. Validate transactions
-        print("[4/10] Validating transactions...")
-        valid_transactions, invalid_count, summary = validate_and_filter(
-            transactions,
-            region=region,
-            min_amount=min_amount,
-            max_amount=max_amount
-        )
-        print(f"• Valid: {summary['final_count']} | Invalid: {invalid_count}")
-
-        # 5. Analysis
-        print("[5/10] Analyzing sales data...")
-        calculate_total_revenue(valid_transactions)
-        region_wise_sales(valid_transactions)
-        top_selling_products(valid_transactions)
-        customer_analysis(valid_transactions)
-        daily_sales_trend(valid_transactions)
-        find_peak_sales_day(valid_transactions)
-        low_performing_products(valid_transactions)
-        print("• Analysis complete")
-
-        # 6. Fetch API products
-        print("[6/10] Fetching product data from API...")
-        api_products = fetch_all_products()
-        print(f"• Fetched {len(api_products)} products")
-
-        # 7. Enrich data
-        print("[7/10] Enriching sales data...")
-        product_mapping = create_product_mapping(api_products)
-        enriched_transactions = enrich_sales_data(valid_transactions, product_mapping)
-
-        enriched_success = sum(1 for tx in enriched_transactions if tx.get("API_Match"))
-        success_rate = (enriched_success / len(enriched_transactions)) * 100 if enriched_transactions else 0
-        print(f"• Enriched {enriched_success}/{len(enriched_transactions)} transactions ({success_rate:.2f}%)")
-
-        # 8. Save enriched data
-        print("[8/10] Saving enriched data...")
-        print("• Saved to: data/enriched_sales_data.txt")
-
-        # 9. Generate report
-        print("[9/10] Generating report...")
-        generate_sales_report(valid_transactions, enriched_transactions)
-        print("• Report saved to: output/sales_report.txt")
+    profile = RunProfile(PROFILE_FILE, trace_memory=PROFILE_MEMORY, cprofile_file=CPROFILE_FILE)
 
-        # 10. Complete
-        print("[10/10] Process Complete!")
-        print("=" * 70)
+    try:
+        with profile:
+            run_pipeline(profile)
 
     except Exception as e:
         print("An error occurred during execution.")
+        if profile.failed_stage:
+            print("Failed stage:", profile.failed_stage)
         print("Error details:", e)
         print("The program exited safely without crashing.")
 
 
+def run_pipeline(profile):
+    # 1. Read sales data
+    print("[1/10] Reading sales data...")
+    print("• Source: data/sales_data.txt")
+
+    # 2. Parse and clean (reused from the parsed-data cache when unchanged)
+    print("[2/10] Parsing and cleaning data...")
+    rejected = [] if REJECTED_LINES_FILE else None
+    with profile.stage("parse", step=2) as stage:
+        transactions = load_transactions(
+            "data/sales_data.txt", workers=PARSE_WORKERS, ingest=INGEST_MODE, rejected=rejected
+        )
+        stage['rows_out'] = len(transactions)
+    print(f"• Parsed {len(transactions)} records")
+    if rejected is not None:
+        save_rejected_lines(rejected, REJECTED_LINES_FILE)
+        print(f"• {len(rejected)} rejected lines saved to: {REJECTED_LINES_FILE}")
+
+    # 3. Display filter options
+    print("[3/10] Filter Options Available:")
+    with profile.stage("filter_options", rows_in=len(transactions), step=3) as stage:
+        preview = validate_and_filter(transactions)
+        stage['rows_out'] = len(preview[0])
+    regions = ["North", "South", "East", "West"]
+    print("Regions:", ", ".join(regions))
+    print("Amount Range: Refer above")
+
+    apply_filter = input("Do you want to filter data? (y/n): ").strip().lower()
+
+    region = None
+    min_amount = None
+    max_amount = None
+    start_date = None
+    end_date = None
+
+    if apply_filter == "y":
+        region = input("Enter region (or press Enter to skip): ").strip() or None
+
+        min_val = input("Enter minimum transaction amount (or press Enter to skip): ").strip()
+        max_val = input("Enter maximum transaction amount (or press Enter to skip): ").strip()
+
+        min_amount = float(min_val) if min_val else None
+        max_amount = float(max_val) if max_val else None
+
+        start_date = input("Enter start date YYYY-MM-DD (or press Enter to skip): ").strip() or None
+        end_date = input("Enter end date YYYY-MM-DD (or press Enter to skip): ").strip() or None
+
+    # 4. Validate transactions
+    print("[4/10] Validating transactions...")
+    unfiltered = (
+        region is None and min_amount is None and max_amount is None and
+        start_date is None and end_date is None
+    )
+    with profile.stage("validate", rows_in=len(transactions), step=4) as stage:
+        if unfiltered:
+            # Nothing to filter: the step 3 validation already has the rows.
+            valid_transactions, invalid_count, summary = preview
+        else:
+            valid_transactions, invalid_count, summary = validate_and_filter(
+                transactions,
+                region=region,
+                min_amount=min_amount,
+                max_amount=max_amount,
+                start_date=start_date,
+                end_date=end_date
+            )
+        stage['rows_out'] = len(valid_transactions)
+    print(f"• Valid: {summary['final_count']} | Invalid: {invalid_count}")
+
+    # 5. Analysis
+    print("[5/10] Analyzing sales data...")
+    with profile.stage("analyze", rows_in=len(valid_transactions), step=5):
+        if INCREMENTAL_MODE and unfiltered:
+            aggregates, state = refresh_aggregates(
+                "data/sales_data.txt", distinct=DISTINCT_COUNT_MODE, transactions=transactions
+            )
+            print(f"• Folded in {state['new_records']} new records")
+            # The saved state and the parsed table should cover the same rows.
+            if aggregates['transaction_count'] != len(valid_transactions):
+                print("• Saved aggregates out of step with the data, recomputing")
+                aggregates = aggregate_sales(valid_transactions, distinct=DISTINCT_COUNT_MODE)
+        elif ANALYTICS_WORKERS > 1:
+            aggregates = aggregate_sales_parallel(
+                valid_transactions, workers=ANALYTICS_WORKERS, distinct=DISTINCT_COUNT_MODE
+            )
+        else:
+            aggregates = aggregate_sales(valid_transactions, distinct=DISTINCT_COUNT_MODE)
+        calculate_total_revenue(valid_transactions, aggregates=aggregates)
+        region_wise_sales(valid_transactions, aggregates=aggregates)
+        top_selling_products(valid_transactions, aggregates=aggregates)
+        customer_analysis(valid_transactions, aggregates=aggregates, top_n=5)
+        daily_sales_trend(valid_transactions, aggregates=aggregates)
+        find_peak_sales_day(valid_transactions, aggregates=aggregates)
+        low_performing_products(valid_transactions, aggregates=aggregates)
+    print("• Analysis complete")
+
+    # 6. Fetch API products
+    print("[6/10] Fetching product data from API...")
+    with profile.stage("fetch_products", step=6) as stage:
+        api_products = load_product_catalog()
+        stage['rows_out'] = len(api_products)
+    print(f"• Fetched {len(api_products)} products")
+
+    # 7. Enrich data
+    print("[7/10] Enriching sales data...")
+    with profile.stage("enrich", rows_in=len(valid_transactions), step=7) as stage:
+        product_mapping = create_product_mapping(api_products)
+        enriched_transactions = enrich_sales_data(
+            valid_transactions, product_mapping, output_format=ENRICHED_OUTPUT_FORMAT
+        )
+        stage['rows_out'] = len(enriched_transactions)
+
+    enrichment = enrichment_summary(enriched_transactions)
+    enriched_success = enrichment['enriched']
+    success_rate = (enriched_success / enrichment['total']) * 100 if enrichment['total'] else 0
+    print(f"• Enriched {enriched_success}/{enrichment['total']} transactions ({success_rate:.2f}%)")
+
+    # 8. Save enriched data (written by enrich_sales_data above)
+    print("[8/10] Saving enriched data...")
+    if ENRICHED_OUTPUT_FORMAT == "columnar":
+        print("• Saved to: data/enriched_sales_data.cols")
+    else:
+        print("• Saved to: data/enriched_sales_data.txt")
+
+    # 9. Generate report
+    print("[9/10] Generating report...")
+    with profile.stage("report", rows_in=len(valid_transactions), step=9):
+        generate_sales_report(
+            valid_transactions, enriched_transactions,
+            output_file=REPORT_FILES[REPORT_FORMAT], aggregates=aggregates, output_format=REPORT_FORMAT
+        )
+    print(f"• Report saved to: {REPORT_FILES[REPORT_FORMAT]}")
+
+    # 10. Complete
+    print("[10/10] Process Complete!")
+    if PROFILE_FILE:
+        print(f"• Run profile appended to: {PROFILE_FILE}")
+    print("=" * 70)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,330 @@
+import argparse
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import math
+import os
+import threading
+from urllib.parse import parse_qs, urlparse
+
+from utils.data_cache import load_transactions
+from utils.incremental import source_checks, ends_with_newline
+from utils.indexes import TransactionIndex
+from utils.rollup import build_sales_cube
+from utils.file_handler import (
+    detect_encoding,
+    data_start_offset,
+    read_line_range
+)
+from utils.data_processor import (
+    parse_transactions,
+    validate_and_filter,
+    aggregate_sales,
+    update_aggregates,
+    calculate_total_revenue,
+    region_wise_sales,
+    top_selling_products,
+    customer_analysis,
+    daily_sales_trend,
+    find_peak_sales_day,
+    low_performing_products
+)
+from utils.report import build_report_data, enrichment_summary
+from utils.api_handler import (
+    load_product_catalog,
+    create_product_mapping,
+    enrich_sales_data,
+    extend_enrichment
+)
+
+
+SALES_FILE = 'data/sales_data.txt'
+
+# Seconds between checks of the sales file for changes; requests in
+# between are served from memory without touching the disk.
+RELOAD_INTERVAL = 2.0
+
+FILTER_PARAMS = ['region', 'min_amount', 'max_amount', 'start_date', 'end_date']
+
+# Endpoints answered from the rollup cube when filtered by region and dates
+# only; /trend is cube-only.
+CUBE_ENDPOINTS = ['/regions', '/daily', '/peak', '/trend']
+
+
+class SalesDataset:
+    # Parsed, validated and enriched transactions plus their aggregates,
+    # kept in memory between requests. Lines appended to the sales file
+    # are parsed and folded in; any other change, including more text on
+    # an unterminated last line, reloads everything.
+
+    def __init__(self, sales_file=SALES_FILE, distinct='exact', ingest='stream'):
+        self.sales_file = sales_file
+        self.distinct = distinct
+        self.ingest = ingest
+        self.lock = threading.Lock()
+        self.product_mapping = create_product_mapping(load_product_catalog())
+        self.last_check = 0.0
+        self.load()
+
+    def load(self):
+        filename = self.sales_file
+        self.encoding = detect_encoding(filename) or 'utf-8'
+        # Up to the end of the file, final unterminated line included, the
+        # same rows main.py and refresh_aggregates see.
+        self.offset = os.path.getsize(filename)
+        transactions = load_transactions(filename, workers=1, ingest=self.ingest)
+
+        if os.path.getsize(filename) != self.offset:
+            # Appended to while loading: keep exactly the rows up to offset.
+            transactions = parse_transactions(
+                read_line_range(filename, data_start_offset(filename), self.offset, self.encoding),
+                as_table=True
+            )
+
+        self.valid, self.invalid_count, summary = validate_and_filter(transactions, verbose=False)
+        self.total_input = summary['total_input']
+        self.aggregates = aggregate_sales(self.valid, distinct=self.distinct)
+        self.cube = build_sales_cube(self.valid, distinct=self.distinct)
+        self._rebuild_views()
+
+        self.terminated = ends_with_newline(filename, self.offset)
+        self.checks = source_checks(filename, self.offset)
+        self.stat = self._file_stat()
+        self.loaded_at = datetime.now().isoformat(timespec='seconds')
+
+    def _file_stat(self):
+        stat = os.stat(self.sales_file)
+        return stat.st_size, stat.st_mtime_ns
+
+    def _rebuild_views(self):
+        self.enriched = enrich_sales_data(self.valid, self.product_mapping, output_file=None)
+        # Indexed over the enriched view so filtered rows keep their API columns.
+        self.index = TransactionIndex(self.enriched, self.invalid_count, self.total_input)
+
+    def refresh(self, force=False):
+        # Returns the number of appended lines folded in, or None when the
+        # whole file was reloaded.
+        now = datetime.now().timestamp()
+        if not force and now - self.last_check < RELOAD_INTERVAL:
+            return 0
+        self.last_check = now
+
+        stat = self._file_stat()
+        if stat == self.stat:
+            return 0
+
+        filename = self.sales_file
+        # An unterminated last line may have been extended since it was loaded.
+        if (not self.terminated or stat[0] < self.offset
+                or source_checks(filename, self.offset) != self.checks):
+            self.load()
+            return None
+
+        end = stat[0]
+        transactions = parse_transactions(
+            read_line_range(filename, self.offset, end, self.encoding), as_table=True
+        )
+        new_valid, new_invalid, _ = validate_and_filter(transactions, verbose=False)
+
+        # Rows are folded in file order, so the aggregates equal a full rebuild.
+        # The enriched table shares its columns with self.valid, so only the
+        # lookups for new ProductIDs and the index entries for new rows are added.
+        first_row = len(self.valid)
+        self.valid.extend(new_valid)
+        update_aggregates(self.aggregates, new_valid)
+        self.cube.add(new_valid)
+        self.invalid_count += new_invalid
+        self.total_input += len(transactions)
+        extend_enrichment(self.enriched, self.product_mapping, first_row)
+        self.index.add_rows(first_row, new_invalid)
+
+        self.offset = end
+        self.terminated = ends_with_newline(filename, end)
+        self.checks = source_checks(filename, end)
+        self.stat = stat
+        return len(transactions)
+
+    def select(self, filters):
+        # Warm aggregates for unfiltered requests; filtered ones are an
+        # index lookup plus one aggregation pass over the matching rows.
+        if not any(value is not None for value in filters.values()):
+            return self.enriched, self.aggregates
+
+        transactions, _, _ = self.index.filter(verbose=False, **filters)
+        return transactions, aggregate_sales(transactions, distinct=self.distinct)
+
+    def enrichment_summary(self):
+        summary = enrichment_summary(self.enriched)
+        total = summary['total']
+        summary['success_rate'] = round(summary['enriched'] / total * 100, 2) if total else 0
+        return summary
+
+
+def _int_param(params, name, default):
+    value = params.get(name)
+    return int(value) if value else default
+
+
+def _filters(params):
+    filters = {name: params.get(name) or None for name in FILTER_PARAMS}
+    for name in ('min_amount', 'max_amount'):
+        if filters[name] is not None:
+            filters[name] = float(filters[name])
+    return filters
+
+
+def cube_request(cube, path, filters, params):
+    region = filters['region']
+    start_date = filters['start_date']
+    end_date = filters['end_date']
+
+    if path == '/regions':
+        totals = cube.region_sales(start_date, end_date, region)
+        total_sales = math.fsum(data['total_sales'] for data in totals.values())
+        return {
+            name: dict(data, percentage=round(data['total_sales'] / total_sales * 100, 2))
+            for name, data in totals.items()
+        }
+    if path == '/daily':
+        return {
+            date: {
+                'revenue': data['revenue'],
+                'transaction_count': data['transaction_count'],
+                'unique_customers': data['unique_customers']
+            }
+            for date, data in cube.trend('day', region, start_date, end_date).items()
+        }
+    if path == '/peak':
+        date, revenue, count = cube.peak('day', region, start_date, end_date)
+        return {'date': date, 'revenue': revenue, 'transaction_count': count}
+    if path == '/trend':
+        return cube.trend(params.get('period') or 'day', region, start_date, end_date)
+    return None
+
+
+def handle_request(dataset, path, params):
+    # path + query parameters -> JSON-serialisable result, or None for an
+    # unknown path.
+    if path == '/reload':
+        folded = dataset.refresh(force=True)
+        return {'reloaded': folded is None, 'new_records': folded or 0, 'records': dataset.total_input}
+
+    if path == '/health':
+        return {'status': 'ok', 'records': dataset.total_input, 'loaded_at': dataset.loaded_at}
+
+    if path == '/enrichment':
+        return dataset.enrichment_summary()
+
+    filters = _filters(params)
+
+    # Region and date filters are lookups in the cube; amount filters need
+    # the rows, as do the warm unfiltered aggregates.
+    if path in CUBE_ENDPOINTS:
+        amount_filtered = filters['min_amount'] is not None or filters['max_amount'] is not None
+        if path == '/trend':
+            if amount_filtered:
+                raise ValueError("/trend does not support min_amount or max_amount")
+            return cube_request(dataset.cube, path, filters, params)
+        if not amount_filtered and any(value is not None for value in filters.values()):
+            return cube_request(dataset.cube, path, filters, params)
+
+    transactions, aggregates = dataset.select(filters)
+
+    if path == '/summary':
+        return {
+            'total_revenue': calculate_total_revenue(transactions, aggregates=aggregates),
+            'transaction_count': aggregates['transaction_count'],
+            'total_input': dataset.total_input,
+            'invalid': dataset.invalid_count
+        }
+    if path == '/report':
+        return build_report_data(aggregates, enrichment_summary(transactions), top_n=_int_param(params, 'n', 5))
+    if path == '/regions':
+        return region_wise_sales(transactions, aggregates=aggregates)
+    if path == '/products/top':
+        return [
+            {'product': name, 'quantity': quantity, 'revenue': revenue}
+            for name, quantity, revenue in top_selling_products(
+                transactions, n=_int_param(params, 'n', 5), aggregates=aggregates
+            )
+        ]
+    if path == '/products/low':
+        return [
+            {'product': name, 'quantity': quantity, 'revenue': revenue}
+            for name, quantity, revenue in low_performing_products(
+                transactions, threshold=_int_param(params, 'threshold', 10), aggregates=aggregates
+            )
+        ]
+    if path == '/customers':
+        return customer_analysis(transactions, aggregates=aggregates, top_n=_int_param(params, 'top', None))
+    if path == '/daily':
+        return daily_sales_trend(transactions, aggregates=aggregates)
+    if path == '/peak':
+        date, revenue, count = find_peak_sales_day(transactions, aggregates=aggregates)
+        return {'date': date, 'revenue': revenue, 'transaction_count': count}
+
+    return None
+
+
+class SalesRequestHandler(BaseHTTPRequestHandler):
+    dataset = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+
+        try:
+            with self.dataset.lock:
+                self.dataset.refresh()
+                result = handle_request(self.dataset, url.path.rstrip('/') or '/', params)
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+            return
+        except Exception as e:
+            self.send_json(500, {'error': str(e)})
+            return
+
+        if result is None:
+            self.send_json(404, {'error': f"Unknown endpoint: {url.path}"})
+        else:
+            self.send_json(200, result)
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve sales analytics as JSON over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--sales-file', default=SALES_FILE)
+    parser.add_argument('--ingest', choices=['stream', 'mmap'], default='stream')
+    parser.add_argument('--distinct', choices=['exact', 'hll'], default='exact')
+    args = parser.parse_args(argv)
+
+    print("=" * 70)
+    print("SALES ANALYTICS SYSTEM - SERVER")
+    print("=" * 70)
+
+    dataset = SalesDataset(args.sales_file, distinct=args.distinct, ingest=args.ingest)
+    print(f"• Loaded {dataset.total_input} records ({len(dataset.valid)} valid)")
+
+    SalesRequestHandler.dataset = dataset
+    server = ThreadingHTTPServer((args.host, args.port), SalesRequestHandler)
+    print(f"• Listening on http://{args.host}:{args.port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("• Shutting down")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,143 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import json
+import os
+import shutil
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+from utils.product_index import CROSSWALK_FILE, ProductIndex, load_crosswalk
+from utils.profiling import profiled
+from utils.transaction_table import TransactionTable, save_table, open_columns
 
-def fetch_all_products():
-    url = "https://dummyjson.com/products?limit=100"
 
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
+API_BASE_URL = "https://dummyjson.com"
+PAGE_SIZE = 100
+MAX_CONCURRENCY = 4
+
+CATALOG_CACHE_FILE = "data/product_catalog.json"
+CATALOG_TTL = 24 * 60 * 60  # seconds
+
+ENRICHED_FILE = 'data/enriched_sales_data.txt'
+ENRICHED_COLUMNS_DIR = 'data/enriched_sales_data.cols'
+WRITE_BATCH_SIZE = 10000  # rows formatted per write call
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+def create_session(pool_size=MAX_CONCURRENCY, retries=3, backoff_factor=0.5):
+    # Pooled keep-alive connections; transient failures are retried with
+    # exponential backoff by urllib3.
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET'])
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def fetch_products_page(session, skip, limit=PAGE_SIZE, base_url=API_BASE_URL, timeout=10, headers=None):
+    response = session.get(
+        f"{base_url}/products",
+        params={'limit': limit, 'skip': skip},
+        headers=headers,
+        timeout=timeout
+    )
+    response.raise_for_status()
+    return response
+
+
+def _validator_headers(page):
+    headers = {}
+    if page is not None:
+        if page.get('etag'):
+            headers['If-None-Match'] = page['etag']
+        if page.get('last_modified'):
+            headers['If-Modified-Since'] = page['last_modified']
+    return headers
+
+
+def _fetch_page(session, skip, page_size, base_url, cached=None):
+    # One catalog page, revalidated against its own cached copy when there
+    # is one. Returns (page, total); a 304 keeps the cached products and
+    # reports no total.
+    response = fetch_products_page(session, skip, page_size, base_url, headers=_validator_headers(cached))
+    if response.status_code == 304 and cached is not None:
+        return dict(cached, changed=False), None
 
-        data = response.json()
-        products = data.get('products', [])
+    body = response.json()
+    return {
+        'skip': skip,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'products': body.get('products', []),
+        'changed': True
+    }, body.get('total')
+
+
+def _fetch_catalog(session, base_url, page_size, max_workers, cached_pages=None, cached_total=None):
+    # The first page tells how many products there are; the remaining
+    # pages are fetched concurrently and kept in catalog order. Each page
+    # is revalidated with its own validators from cached_pages, so a 304
+    # only vouches for that page. Returns (pages, total).
+    cached = {page['skip']: page for page in cached_pages or []}
+
+    first_page, total = _fetch_page(session, 0, page_size, base_url, cached.get(0))
+    if total is None:
+        total = cached_total
+    if total is None:
+        total = len(first_page['products'])
+
+    pages = [first_page]
+    step_start = len(first_page['products'])
+    skips = range(step_start, total, page_size) if step_start else []
+
+    while skips:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(
+                lambda skip: _fetch_page(session, skip, page_size, base_url, cached.get(skip)),
+                skips
+            ))
+        pages.extend(page for page, _ in results)
+
+        # A changed page may report a larger catalog than the cached total.
+        reported = [page_total for _, page_total in results if page_total is not None]
+        next_skip = skips[-1] + page_size
+        if reported and max(reported) > next_skip:
+            total = max(reported)
+            skips = range(next_skip, total, page_size)
+        else:
+            skips = []
+
+    return pages, total
+
+
+def _catalog_products(pages):
+    return [product for page in pages for product in page['products']]
+
+
+@profiled
+def fetch_all_products(base_url=API_BASE_URL, page_size=PAGE_SIZE, max_workers=MAX_CONCURRENCY, session=None):
+    own_session = session is None
+    if own_session:
+        session = create_session(pool_size=max_workers)
+
+    try:
+        pages, _ = _fetch_catalog(session, base_url, page_size, max_workers)
+        products = _catalog_products(pages)
 
         print(f"Successfully fetched {len(products)} products from API.")
         return products
@@ -18,94 +146,426 @@ def fetch_all_products():
         print("Failed to fetch products from API.")
         print("Error:", e)
         return []
-    
-def create_product_mapping(api_products):
-    product_mapping = {}
 
-    for product in api_products:
-        product_id = product.get('id')
+    finally:
+        if own_session:
+            session.close()
+
 
-        if product_id is None:
-            continue
+def _read_catalog_cache(cache_file):
+    try:
+        with open(cache_file, encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_catalog_cache(cache_file, cache):
+    try:
+        directory = os.path.dirname(cache_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        temp_file = cache_file + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as file:
+            json.dump(cache, file)
+        os.replace(temp_file, cache_file)
+
+    except OSError as e:
+        print("Failed to write product catalog cache.")
+        print("Error:", e)
+
+
+@profiled
+def load_product_catalog(cache_file=CATALOG_CACHE_FILE, ttl=CATALOG_TTL, base_url=API_BASE_URL,
+                         page_size=PAGE_SIZE, max_workers=MAX_CONCURRENCY):
+    cache = _read_catalog_cache(cache_file)
+    if cache is not None and (cache.get('base_url') != base_url or cache.get('page_size') != page_size
+                              or 'pages' not in cache):
+        cache = None
+
+    if cache is not None:
+        cached_products = _catalog_products(cache['pages'])
+
+    if cache is not None and time.time() - cache['fetched_at'] < ttl:
+        print(f"Using cached product catalog ({len(cached_products)} products).")
+        return cached_products
+
+    session = create_session(pool_size=max_workers)
+
+    try:
+        pages, total = _fetch_catalog(
+            session, base_url, page_size, max_workers,
+            cache['pages'] if cache is not None else None,
+            cache['total'] if cache is not None else None
+        )
 
-        product_mapping[product_id] = {
-            'title': product.get('title'),
-            'category': product.get('category'),
-            'brand': product.get('brand'),
-            'rating': product.get('rating')
+    except requests.exceptions.RequestException as e:
+        if cache is None:
+            print("Failed to fetch products from API.")
+            print("Error:", e)
+            return []
+
+        print("Failed to refresh product catalog, using stale cache.")
+        print("Error:", e)
+        return cached_products
+
+    finally:
+        session.close()
+
+    products = _catalog_products(pages)
+    changed = sum(page.pop('changed') for page in pages)
+
+    if cache is not None and not changed and len(pages) == len(cache['pages']):
+        print("Product catalog not modified, cache revalidated.")
+        mapping = cache['mapping']
+    else:
+        if cache is not None:
+            print(f"Product catalog changed ({changed} of {len(pages)} pages), refreshed from API.")
+        print(f"Successfully fetched {len(products)} products from API.")
+        mapping = create_product_mapping(products)
+
+    _write_catalog_cache(cache_file, {
+        'base_url': base_url,
+        'page_size': page_size,
+        'fetched_at': time.time(),
+        'total': total,
+        'pages': pages,
+        'mapping': mapping
+    })
+
+    return products
+
+
+@profiled
+def create_product_mapping(api_products=None, cache_file=CATALOG_CACHE_FILE,
+                           rules=None, crosswalk_file=CROSSWALK_FILE, fuzzy=True):
+    # Returns a ProductIndex: the catalog id -> attributes mapping plus the
+    # ProductID resolution rules, crosswalk and title index used to match
+    # sales ProductIDs against it.
+    if api_products is None:
+        # Prebuilt mapping from the catalog cache; JSON keys are strings.
+        cache = _read_catalog_cache(cache_file) or {}
+        product_mapping = {
+            int(product_id) if product_id.isdigit() else product_id: info
+            for product_id, info in cache.get('mapping', {}).items()
         }
+    else:
+        product_mapping = {}
+
+        for product in api_products:
+            product_id = product.get('id')
+
+            if product_id is None:
+                continue
+
+            product_mapping[product_id] = {
+                'title': product.get('title'),
+                'category': product.get('category'),
+                'brand': product.get('brand'),
+                'rating': product.get('rating')
+            }
 
-    return product_mapping
+    return ProductIndex(
+        product_mapping,
+        rules=rules,
+        crosswalk=load_crosswalk(crosswalk_file),
+        fuzzy=fuzzy
+    )
 
-def enrich_sales_data(transactions, product_mapping):
-    enriched_transactions = []
+def _first_product_names(table, first_code=0, first_row=0):
+    # ProductName first seen with each ProductID code from first_code on,
+    # looking at rows from first_row on, for fuzzy matching. Codes that
+    # appear on none of those rows (validated tables share the parsed
+    # table's dictionary) are left as None.
+    product_names = table.dictionaries['ProductName']
+    names = [None] * (len(table.dictionaries['ProductID']) - first_code)
+    product_codes = table.codes['ProductID']
+    name_codes = table.codes['ProductName']
+
+    if np is not None:
+        row_codes = np.frombuffer(product_codes, dtype='I')[first_row:]
+        codes, first_rows = np.unique(row_codes, return_index=True)
+        for product_code, row in zip(codes.tolist(), (first_rows + first_row).tolist()):
+            if product_code >= first_code:
+                names[product_code - first_code] = product_names[name_codes[row]]
+        return names
+
+    for row in range(first_row, len(product_codes)):
+        product_code = product_codes[row]
+        if product_code >= first_code and names[product_code - first_code] is None:
+            names[product_code - first_code] = product_names[name_codes[row]]
+
+    return names
+
+
+def _resolve_api_info(product_mapping, product_id, product_name=None):
+    try:
+        if isinstance(product_mapping, ProductIndex):
+            return product_mapping.lookup(product_id, product_name)
+
+        # Extract numeric ID: P101 -> 101
+        numeric_id = int(product_id.replace('P', ''))
+        return product_mapping.get(numeric_id)
+
+    except Exception:
+        # Any error keeps API_Match as False and fields as None
+        return None
+
+
+def _enrichment_values(table, product_mapping, first_code=0, first_row=0):
+    # API_Category, API_Brand, API_Rating and API_Match values for each
+    # ProductID code from first_code on.
+    categories = []
+    brands = []
+    ratings = []
+    matches = []
+
+    product_ids = table.dictionaries['ProductID'][first_code:]
+    # Names are only needed for fuzzy title matching.
+    if isinstance(product_mapping, ProductIndex) and product_mapping.fuzzy:
+        product_names = _first_product_names(table, first_code, first_row)
+    else:
+        product_names = [None] * len(product_ids)
+
+    # Attributes are resolved once per distinct ProductID and joined onto
+    # the rows as lookup columns keyed by the ProductID code.
+    for product_id, product_name in zip(product_ids, product_names):
+        api_info = _resolve_api_info(product_mapping, product_id, product_name)
+
+        if api_info is None:
+            categories.append(None)
+            brands.append(None)
+            ratings.append(None)
+            matches.append(False)
+        else:
+            categories.append(api_info.get('category'))
+            brands.append(api_info.get('brand'))
+            ratings.append(api_info.get('rating'))
+            matches.append(True)
+
+    return categories, brands, ratings, matches
+
+
+@profiled
+def enrich_sales_data(transactions, product_mapping, output_file=ENRICHED_FILE, output_format='text'):
+    # Row dicts are packed into a TransactionTable once instead of being
+    # copied per row; the result iterates as enriched row dicts.
+    if not isinstance(transactions, TransactionTable):
+        transactions = TransactionTable.from_records(transactions)
+
+    categories, brands, ratings, matches = _enrichment_values(transactions, product_mapping)
+
+    enriched = transactions.copy()
+    enriched.add_lookup_column('API_Category', 'ProductID', categories)
+    enriched.add_lookup_column('API_Brand', 'ProductID', brands)
+    enriched.add_lookup_column('API_Rating', 'ProductID', ratings)
+    enriched.add_lookup_column('API_Match', 'ProductID', matches)
+
+    # Save to file as required; output_file=None leaves saving to the caller
+    if output_file:
+        save_enriched_data(enriched, output_file, output_format=output_format)
+
+    return enriched
+
+
+def extend_enrichment(enriched, product_mapping, first_row=0):
+    # After rows were appended to an enriched table in place, resolves only
+    # the ProductIDs they added to its dictionary. first_row is where the
+    # appended rows start; new codes cannot appear before it.
+    first_code = len(enriched.lookups['API_Match'][1])
+    if first_code == len(enriched.dictionaries['ProductID']):
+        return enriched
+
+    values = _enrichment_values(enriched, product_mapping, first_code, first_row)
+    for name, new_values in zip(['API_Category', 'API_Brand', 'API_Rating', 'API_Match'], values):
+        enriched.lookups[name][1].extend(new_values)
+
+    return enriched
+
+
+def iter_enriched_rows(transactions, product_mapping):
+    # Streaming counterpart of enrich_sales_data for any iterable of row
+    # dicts; feed it to save_enriched_data to enrich and save in bounded
+    # memory. Lookups are memoised per ProductID.
+    resolved = {}
 
     for tx in transactions:
-        enriched_tx = tx.copy()
+        product_id = tx.get('ProductID', '')
 
-        # Default API fields
-        enriched_tx['API_Category'] = None
-        enriched_tx['API_Brand'] = None
-        enriched_tx['API_Rating'] = None
-        enriched_tx['API_Match'] = False
+        api_info = resolved.get(product_id, False)
+        if api_info is False:
+            api_info = resolved[product_id] = _resolve_api_info(
+                product_mapping, product_id, tx.get('ProductName')
+            )
 
-        try:
-            product_id = tx.get('ProductID', '')
+        enriched_tx = dict(tx)
+        if api_info is None:
+            enriched_tx['API_Category'] = None
+            enriched_tx['API_Brand'] = None
+            enriched_tx['API_Rating'] = None
+            enriched_tx['API_Match'] = False
+        else:
+            enriched_tx['API_Category'] = api_info.get('category')
+            enriched_tx['API_Brand'] = api_info.get('brand')
+            enriched_tx['API_Rating'] = api_info.get('rating')
+            enriched_tx['API_Match'] = True
 
-            # Extract numeric ID: P101 -> 101
-            numeric_id = int(product_id.replace('P', ''))
+        yield enriched_tx
 
-            if numeric_id in product_mapping:
-                api_info = product_mapping[numeric_id]
-                enriched_tx['API_Category'] = api_info.get('category')
-                enriched_tx['API_Brand'] = api_info.get('brand')
-                enriched_tx['API_Rating'] = api_info.get('rating')
-                enriched_tx['API_Match'] = True
 
-        except Exception:
-            # Any error keeps API_Match as False and fields as None
-            pass
+def _optional_str(value):
+    return '' if value is None else str(value)
 
-        enriched_transactions.append(enriched_tx)
 
-    # Save to file as required
-    save_enriched_data(enriched_transactions)
+def _format_rows(rows):
+    for tx in rows:
+        yield '|'.join([
+            str(tx.get('TransactionID', '')),
+            str(tx.get('Date', '')),
+            str(tx.get('ProductID', '')),
+            str(tx.get('ProductName', '')),
+            str(tx.get('Quantity', '')),
+            str(tx.get('UnitPrice', '')),
+            str(tx.get('CustomerID', '')),
+            str(tx.get('Region', '')),
+            _optional_str(tx.get('API_Category')),
+            _optional_str(tx.get('API_Brand')),
+            _optional_str(tx.get('API_Rating')),
+            str(tx.get('API_Match'))
+        ]) + '\n'
 
-    return enriched_transactions
 
+def _format_table_rows(table):
+    # Text for coded columns is built once per distinct value; the API
+    # columns are pre-joined per ProductID.
+    dictionaries = table.dictionaries
+    codes = table.codes
+
+    def texts(name):
+        return [str(value) for value in dictionaries[name]]
+
+    api_text = [''] * len(dictionaries['ProductID'])
+    api_columns = ['API_Category', 'API_Brand', 'API_Rating']
+    if all(name in table.lookups for name in api_columns + ['API_Match']):
+        for code in range(len(api_text)):
+            fields = [_optional_str(table.lookups[name][1][code]) for name in api_columns]
+            fields.append(str(table.lookups['API_Match'][1][code]))
+            api_text[code] = '|'.join(fields)
+    else:
+        api_text = ['|||None'] * len(api_text)
+
+    dates = texts('Date')
+    product_ids = texts('ProductID')
+    product_names = texts('ProductName')
+    customer_ids = texts('CustomerID')
+    regions = texts('Region')
+
+    rows = zip(
+        table.transaction_ids, codes['Date'], codes['ProductID'], codes['ProductName'],
+        table.quantity, table.unit_price, codes['CustomerID'], codes['Region']
+    )
+
+    for tid, dc, pc, nc, quantity, unit_price, cc, rc in rows:
+        yield (
+            f"{tid}|{dates[dc]}|{product_ids[pc]}|{product_names[nc]}|"
+            f"{quantity}|{unit_price!r}|{customer_ids[cc]}|{regions[rc]}|{api_text[pc]}\n"
+        )
+
+
+@profiled
+def save_enriched_data(enriched_transactions, filename=ENRICHED_FILE, batch_size=WRITE_BATCH_SIZE,
+                       output_format='text'):
+    if output_format == 'columnar':
+        if filename == ENRICHED_FILE:
+            filename = ENRICHED_COLUMNS_DIR
+        save_enriched_columns(enriched_transactions, filename)
+        return
 
-def save_enriched_data(enriched_transactions, filename='data/enriched_sales_data.txt'):
     header = [
         'TransactionID', 'Date', 'ProductID', 'ProductName',
         'Quantity', 'UnitPrice', 'CustomerID', 'Region',
         'API_Category', 'API_Brand', 'API_Rating', 'API_Match'
     ]
 
+    if isinstance(enriched_transactions, TransactionTable):
+        lines = _format_table_rows(enriched_transactions)
+    else:
+        lines = _format_rows(enriched_transactions)
+
+    # Written to a temporary file and renamed into place, so readers never
+    # see a half-written file.
+    temp_file = filename + '.tmp'
+
     try:
-        with open(filename, 'w', encoding='utf-8') as file:
+        with open(temp_file, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as file:
             file.write('|'.join(header) + '\n')
 
-            for tx in enriched_transactions:
-                row = [
-                    str(tx.get('TransactionID', '')),
-                    str(tx.get('Date', '')),
-                    str(tx.get('ProductID', '')),
-                    str(tx.get('ProductName', '')),
-                    str(tx.get('Quantity', '')),
-                    str(tx.get('UnitPrice', '')),
-                    str(tx.get('CustomerID', '')),
-                    str(tx.get('Region', '')),
-                    str(tx.get('API_Category')) if tx.get('API_Category') is not None else '',
-                    str(tx.get('API_Brand')) if tx.get('API_Brand') is not None else '',
-                    str(tx.get('API_Rating')) if tx.get('API_Rating') is not None else '',
-                    str(tx.get('API_Match'))
-                ]
-
-                file.write('|'.join(row) + '\n')
+            while True:
+                batch = list(islice(lines, batch_size))
+                if not batch:
+                    break
+                file.write(''.join(batch))
 
+        os.replace(temp_file, filename)
         print(f"Enriched sales data saved to {filename}")
 
     except Exception as e:
         print("Failed to save enriched sales data.")
         print("Error:", e)
 
+        try:
+            os.remove(temp_file)
+        except OSError:
+            pass
+
+
+def _enriched_table_from_rows(rows):
+    # API fields depend only on ProductID, so they become lookup columns
+    # keyed by the ProductID code, taken from the first row of each ID.
+    table = TransactionTable()
+    api_columns = ['API_Category', 'API_Brand', 'API_Rating', 'API_Match']
+    api_values = {name: [] for name in api_columns}
+
+    for tx in rows:
+        table.append(tx)
+        code = table.codes['ProductID'][-1]
+        if code == len(api_values['API_Match']):
+            api_values['API_Category'].append(tx.get('API_Category'))
+            api_values['API_Brand'].append(tx.get('API_Brand'))
+            api_values['API_Rating'].append(tx.get('API_Rating'))
+            api_values['API_Match'].append(bool(tx.get('API_Match')))
+
+    for name in api_columns:
+        table.add_lookup_column(name, 'ProductID', api_values[name])
+
+    return table
+
+
+@profiled
+def save_enriched_columns(enriched_transactions, directory=ENRICHED_COLUMNS_DIR):
+    # Typed column files (int64 Quantity, float64 UnitPrice, uint32 codes
+    # for the string columns) plus a manifest with the dictionaries and
+    # the per-product API fields. Load with load_enriched_columns.
+    if not isinstance(enriched_transactions, TransactionTable):
+        enriched_transactions = _enriched_table_from_rows(enriched_transactions)
+
+    temp_directory = directory + '.tmp'
+
+    try:
+        shutil.rmtree(temp_directory, ignore_errors=True)
+        save_table(enriched_transactions, temp_directory)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(temp_directory, directory)
+        print(f"Enriched sales data saved to {directory}")
+
+    except Exception as e:
+        print("Failed to save enriched sales data.")
+        print("Error:", e)
+        shutil.rmtree(temp_directory, ignore_errors=True)
+
+
+@profiled
+def load_enriched_columns(directory=ENRICHED_COLUMNS_DIR, columns=None):
+    # Memory-maps just the requested columns; see open_columns.
+    return open_columns(directory, columns)
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import shutil
+
+from utils.data_processor import (
+    parse_transactions,
+    parse_transactions_mmap,
+    parse_transactions_parallel
+)
+from utils.file_handler import detect_encoding, read_line_range, stream_sales_data
+from utils.incremental import source_checks, ends_with_newline
+from utils.transaction_table import save_table, load_table, read_manifest
+
+
+CACHE_DIR = 'data/.cache'
+
+# Lines the parser dropped, saved next to the cached table.
+REJECTED_FILE = 'rejected.json'
+
+
+def file_fingerprint(filename, with_hash=True):
+    stat = os.stat(filename)
+    fingerprint = {
+        'path': os.path.abspath(filename),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns
+    }
+
+    if with_hash:
+        digest = hashlib.blake2b(digest_size=20)
+        with open(filename, 'rb') as file:
+            for block in iter(lambda: file.read(1024 * 1024), b''):
+                digest.update(block)
+        fingerprint['content_hash'] = digest.hexdigest()
+
+    return fingerprint
+
+
+def cache_path(filename, cache_dir=CACHE_DIR):
+    key = hashlib.sha1(os.path.abspath(filename).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, key)
+
+
+def _cached_fingerprint(directory):
+    try:
+        return read_manifest(directory)['metadata'].get('source')
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _is_fresh(cached, filename):
+    if cached is None:
+        return False
+
+    current = file_fingerprint(filename, with_hash=False)
+    if cached['path'] != current['path'] or cached['size'] != current['size']:
+        return False
+
+    if cached['mtime_ns'] == current['mtime_ns']:
+        return True
+
+    # Same size but touched: only the content hash can tell.
+    return file_fingerprint(filename)['content_hash'] == cached.get('content_hash')
+
+
+def _load_rejected(directory):
+    with open(os.path.join(directory, REJECTED_FILE), encoding='utf-8') as file:
+        return [tuple(entry) for entry in json.load(file)]
+
+
+def _append_start(cached, source, filename, directory):
+    # Offset the cached table was parsed up to when the file has only grown
+    # since, so just the appended lines need parsing; None otherwise.
+    if cached is None or 'checks' not in cached or not cached.get('terminated'):
+        return None
+    if cached['path'] != source['path'] or cached['size'] >= source['size']:
+        return None
+    # The saved rejected lines are extended along with the table.
+    if not os.path.exists(os.path.join(directory, REJECTED_FILE)):
+        return None
+    if source_checks(filename, cached['size']) != cached['checks']:
+        return None
+    return cached['size']
+
+
+def _mark_append_point(source, filename):
+    # Lets the next run parse only the lines appended after this size.
+    source['checks'] = source_checks(filename, source['size'])
+    source['terminated'] = ends_with_newline(filename, source['size'])
+
+
+def _save_cache(transactions, parsed_rejected, directory, source):
+    try:
+        temp_directory = directory + '.tmp'
+        shutil.rmtree(temp_directory, ignore_errors=True)
+        save_table(transactions, temp_directory, metadata={'source': source})
+        with open(os.path.join(temp_directory, REJECTED_FILE), 'w', encoding='utf-8') as file:
+            json.dump(parsed_rejected, file)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(temp_directory, directory)
+    except OSError as e:
+        print("Failed to write parsed data cache.")
+        print("Error:", e)
+
+
+def _extend_cached(filename, directory, source, start):
+    # The cached table plus the lines from start up to the fingerprinted
+    # size, parsed with the same rules as a full parse. None when the
+    # cache cannot be read.
+    encoding = detect_encoding(filename)
+    if encoding is None:
+        return None
+
+    try:
+        transactions = load_table(directory)
+        parsed_rejected = _load_rejected(directory)
+    except (OSError, ValueError, KeyError) as e:
+        print("Parsed data cache is unreadable, rebuilding.")
+        print("Error:", e)
+        return None
+
+    new_rejected = []
+    appended = parse_transactions(
+        read_line_range(filename, start, source['size'], encoding), as_table=True, rejected=new_rejected
+    )
+    transactions.extend(appended)
+    parsed_rejected.extend(new_rejected)
+    print(f"Parsed {len(appended) + len(new_rejected)} appended lines into cached transactions.")
+
+    _mark_append_point(source, filename)
+    _save_cache(transactions, parsed_rejected, directory, source)
+    return transactions, parsed_rejected
+
+
+def load_transactions(filename, cache_dir=CACHE_DIR, workers=1, ingest='stream', rejected=None):
+    # Pass a list as rejected to get (line, reason) for every line the
+    # parser dropped, from the cache or from a fresh parse. When lines were
+    # only appended to the file, just those are parsed and added to the
+    # cached table.
+    directory = cache_path(filename, cache_dir)
+
+    try:
+        cached = _cached_fingerprint(directory)
+        fresh = _is_fresh(cached, filename)
+        if fresh and rejected is not None and not os.path.exists(os.path.join(directory, REJECTED_FILE)):
+            # Cached before rejected lines were kept alongside the table.
+            fresh = False
+        # Fingerprint before parsing so a write during the parse makes the
+        # next run rebuild instead of trusting a cache that misses the new lines.
+        source = None if fresh else file_fingerprint(filename)
+        append_start = None if fresh else _append_start(cached, source, filename, directory)
+    except FileNotFoundError:
+        print(f"Error: File '{filename}' not found.")
+        return parse_transactions([], as_table=True)
+
+    if fresh:
+        try:
+            transactions = load_table(directory)
+            if rejected is not None:
+                rejected.extend(_load_rejected(directory))
+            print("Loaded parsed transactions from cache.")
+            return transactions
+        except (OSError, ValueError, KeyError) as e:
+            print("Parsed data cache is unreadable, rebuilding.")
+            print("Error:", e)
+            source = file_fingerprint(filename)
+
+    if append_start is not None:
+        extended = _extend_cached(filename, directory, source, append_start)
+        if extended is not None:
+            transactions, parsed_rejected = extended
+            if rejected is not None:
+                rejected.extend(parsed_rejected)
+            return transactions
+
+    # Always collected, so a later run can read them from the cache.
+    parsed_rejected = []
+
+    if workers > 1:
+        transactions = parse_transactions_parallel(
+            filename, workers=workers, as_table=True, rejected=parsed_rejected
+        )
+    elif ingest == 'mmap':
+        transactions = parse_transactions_mmap(filename, rejected=parsed_rejected)
+    else:
+        transactions = parse_transactions(stream_sales_data(filename), as_table=True, rejected=parsed_rejected)
+
+    if rejected is not None:
+        rejected.extend(parsed_rejected)
+
+    # Only when the parse covered exactly the fingerprinted bytes can a
+    # later run continue from them.
+    try:
+        if os.path.getsize(filename) == source['size']:
+            _mark_append_point(source, filename)
+    except OSError:
+        pass
+
+    _save_cache(transactions, parsed_rejected, directory, source)
+    return transactions
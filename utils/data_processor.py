@@ -1,46 +1,206 @@
-def parse_transactions(raw_lines):
-    cleaned_transactions = []
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from utils.rollup import period_key
+from utils.sketches import HyperLogLog, SpaceSaving, top_k
+from utils.file_handler import detect_encoding, split_file_ranges, read_line_range, iter_mmap_fields
+from utils.profiling import disable_profiling, profiled
+from utils.report import build_report_data, enrichment_summary, render_report
+from utils.transaction_table import TransactionTable
+
+
+# Reasons recorded for lines the parser drops.
+REJECT_FIELD_COUNT = 'wrong field count'
+REJECT_NUMBER = 'invalid Quantity or UnitPrice'
+REJECT_OVERFLOW = 'Quantity out of range'
+
+@profiled
+def parse_transactions(raw_lines, as_table=False, rejected=None):
+    # Pass a list as rejected to get (line, reason) for every dropped line.
+    cleaned_transactions = TransactionTable() if as_table else []
+
+    # Repeated values share one string object in the list of records.
+    interned = {}
+    intern = interned.setdefault
 
     for line in raw_lines:
         parts = line.split('|')
 
+        # Cheapest checks first: field count, then the two numbers.
         if len(parts) != 8:
+            if rejected is not None:
+                rejected.append((line, REJECT_FIELD_COUNT))
             continue
 
-        transaction_id = parts[0].strip()
-        date = parts[1].strip()
-        product_id = parts[2].strip()
-
-        product_name = parts[3].replace(',', '').strip()
+        transaction_id, date, product_id, product_name, quantity_str, unit_price_str, customer_id, region = parts
 
-        quantity_str = parts[4].replace(',', '').strip()
-        unit_price_str = parts[5].replace(',', '').strip()
-
-        customer_id = parts[6].strip()
-        region = parts[7].strip()
+        # Commas (thousands separators, or inside product names) are rare,
+        # so most lines skip the replace calls.
+        if ',' in line:
+            product_name = product_name.replace(',', '')
+            quantity_str = quantity_str.replace(',', '')
+            unit_price_str = unit_price_str.replace(',', '')
 
         try:
-            quantity = int(quantity_str)
-            unit_price = float(unit_price_str)
+            quantity = int(quantity_str.strip())
+            unit_price = float(unit_price_str.strip())
         except ValueError:
+            if rejected is not None:
+                rejected.append((line, REJECT_NUMBER))
+            continue
+
+        date = date.strip()
+        product_id = product_id.strip()
+        product_name = product_name.strip()
+        customer_id = customer_id.strip()
+        region = region.strip()
+
+        if as_table:
+            try:
+                cleaned_transactions.append_row(
+                    transaction_id.strip(), date, product_id, product_name,
+                    quantity, unit_price, customer_id, region
+                )
+            except OverflowError:
+                if rejected is not None:
+                    rejected.append((line, REJECT_OVERFLOW))
             continue
 
         record = {
-            'TransactionID': transaction_id,
-            'Date': date,
-            'ProductID': product_id,
-            'ProductName': product_name,
+            'TransactionID': transaction_id.strip(),
+            'Date': intern(date, date),
+            'ProductID': intern(product_id, product_id),
+            'ProductName': intern(product_name, product_name),
             'Quantity': quantity,
             'UnitPrice': unit_price,
-            'CustomerID': customer_id,
-            'Region': region
+            'CustomerID': intern(customer_id, customer_id),
+            'Region': intern(region, region)
         }
 
         cleaned_transactions.append(record)
 
     return cleaned_transactions
 
-def validate_and_filter(transactions, region=None, min_amount=None, max_amount=None):
+def _parse_file_range(filename, start, end, encoding, as_table, collect_rejected=False):
+    rejected = [] if collect_rejected else None
+    parsed = parse_transactions(read_line_range(filename, start, end, encoding), as_table, rejected)
+    return parsed, rejected
+
+@profiled
+def parse_transactions_parallel(filename, workers=None, as_table=False, rejected=None):
+    workers = workers or os.cpu_count() or 1
+    merged = TransactionTable() if as_table else []
+
+    try:
+        encoding = detect_encoding(filename)
+    except FileNotFoundError:
+        print(f"Error: File '{filename}' not found.")
+        return merged
+
+    if encoding is None:
+        print("Error: Unable to read file with supported encodings.")
+        return merged
+
+    # A few chunks per worker keeps the pool busy when chunks parse unevenly.
+    ranges = split_file_ranges(filename, workers * 4)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=disable_profiling) as executor:
+        futures = [
+            executor.submit(
+                _parse_file_range, filename, start, end, encoding, as_table, rejected is not None
+            )
+            for start, end in ranges
+        ]
+
+        # Merge in submission order so records keep their input order.
+        for future in futures:
+            parsed, chunk_rejected = future.result()
+            merged.extend(parsed)
+            if rejected is not None:
+                rejected.extend(chunk_rejected)
+
+    return merged
+
+@profiled
+def parse_transactions_mmap(filename, rejected=None):
+    # rejected works as in parse_transactions.
+    table = TransactionTable()
+
+    try:
+        encoding = detect_encoding(filename)
+    except FileNotFoundError:
+        print(f"Error: File '{filename}' not found.")
+        return table
+
+    if encoding is None:
+        print("Error: Unable to read file with supported encodings.")
+        return table
+
+    # Raw bytes -> dictionary code, so each distinct value is decoded once.
+    known = {name: {} for name in table.codes}
+
+    def reject(parts, reason):
+        if rejected is not None:
+            rejected.append((b'|'.join(parts).decode(encoding, 'replace'), reason))
+
+    def code_of(name, raw):
+        code = known[name].get(raw)
+        if code is None:
+            code = known[name][raw] = table.encode(name, raw.decode(encoding, 'replace'))
+        return code
+
+    for parts in iter_mmap_fields(filename):
+        if len(parts) != 8:
+            reject(parts, REJECT_FIELD_COUNT)
+            continue
+
+        try:
+            quantity = int(parts[4].replace(b',', b''))
+            unit_price = float(parts[5].replace(b',', b''))
+        except ValueError:
+            reject(parts, REJECT_NUMBER)
+            continue
+
+        try:
+            table.append_encoded(
+                parts[0].strip().decode(encoding, 'replace'),
+                quantity,
+                unit_price,
+                code_of('Date', parts[1].strip()),
+                code_of('ProductID', parts[2].strip()),
+                code_of('ProductName', parts[3].replace(b',', b'').strip()),
+                code_of('CustomerID', parts[6].strip()),
+                code_of('Region', parts[7].strip())
+            )
+        except OverflowError:
+            reject(parts, REJECT_OVERFLOW)
+            continue
+
+    return table
+
+@profiled
+def validate_and_filter(transactions, region=None, min_amount=None, max_amount=None, verbose=True,
+                        start_date=None, end_date=None, index=None):
+    # With a TransactionIndex built from the same data, validation is already
+    # done and the filters become index lookups.
+    if index is not None:
+        return index.filter(region, min_amount, max_amount, start_date, end_date, verbose)
+
+    if isinstance(transactions, TransactionTable):
+        if np is not None:
+            return _validate_and_filter_vectorized(
+                transactions, region, min_amount, max_amount, verbose, start_date, end_date
+            )
+        return _validate_and_filter_table(
+            transactions, region, min_amount, max_amount, verbose, start_date, end_date
+        )
+
     valid_transactions = []
     invalid_count = 0
 
@@ -70,9 +230,10 @@ def validate_and_filter(transactions, region=None, min_amount=None, max_amount=N
         except Exception:
             invalid_count += 1
 
-    print("Available Regions:", sorted(regions))
-    if amounts:
-        print("Transaction Amount Range:", min(amounts), "to", max(amounts))
+    if verbose:
+        print("Available Regions:", sorted(regions))
+        if amounts:
+            print("Transaction Amount Range:", min(amounts), "to", max(amounts))
 
     filtered_by_region = 0
     filtered_by_amount = 0
@@ -81,7 +242,8 @@ def validate_and_filter(transactions, region=None, min_amount=None, max_amount=N
         before = len(valid_transactions)
         valid_transactions = [t for t in valid_transactions if t['Region'] == region]
         filtered_by_region = before - len(valid_transactions)
-        print("Records after region filter:", len(valid_transactions))
+        if verbose:
+            print("Records after region filter:", len(valid_transactions))
 
     if min_amount is not None:
         before = len(valid_transactions)
@@ -94,47 +256,604 @@ def validate_and_filter(transactions, region=None, min_amount=None, max_amount=N
         filtered_by_amount += before - len(valid_transactions)
 
     if min_amount is not None or max_amount is not None:
-        print("Records after amount filter:", len(valid_transactions))
+        if verbose:
+            print("Records after amount filter:", len(valid_transactions))
+
+    filtered_by_date = 0
+
+    if start_date is not None or end_date is not None:
+        before = len(valid_transactions)
+        valid_transactions = [
+            t for t in valid_transactions
+            if (start_date is None or t['Date'] >= start_date) and
+            (end_date is None or t['Date'] <= end_date)
+        ]
+        filtered_by_date = before - len(valid_transactions)
+        if verbose:
+            print("Records after date filter:", len(valid_transactions))
 
     summary = {
         'total_input': len(transactions),
         'invalid': invalid_count,
         'filtered_by_region': filtered_by_region,
         'filtered_by_amount': filtered_by_amount,
+        'filtered_by_date': filtered_by_date,
         'final_count': len(valid_transactions)
     }
 
     return valid_transactions, invalid_count, summary
 
-def calculate_total_revenue(transactions):
-    total_revenue = 0.0
+def _date_in_range(dates, start_date, end_date):
+    # Per distinct Date code: does it fall inside [start_date, end_date]?
+    return [
+        (start_date is None or date >= start_date) and (end_date is None or date <= end_date)
+        for date in dates
+    ]
 
-    for tx in transactions:
-        total_revenue += tx['Quantity'] * tx['UnitPrice']
+def _validate_and_filter_table(table, region, min_amount, max_amount, verbose=True,
+                               start_date=None, end_date=None):
+    dictionaries = table.dictionaries
+    codes = table.codes
 
-    return total_revenue
+    # Prefix and emptiness checks only depend on the distinct value, so they
+    # are resolved once per code instead of once per row.
+    product_ok = [p.startswith('P') for p in dictionaries['ProductID']]
+    customer_ok = [c.startswith('C') for c in dictionaries['CustomerID']]
+    region_ok = [bool(r) for r in dictionaries['Region']]
 
-def region_wise_sales(transactions):
-    region_data = {}
-    total_sales = 0.0
+    valid_indices = []
+    amounts = []
+    invalid_count = 0
+    region_codes = set()
+
+    rows = zip(
+        table.transaction_ids, table.quantity, table.unit_price,
+        codes['ProductID'], codes['CustomerID'], codes['Region']
+    )
+
+    for i, (tid, quantity, unit_price, pc, cc, rc) in enumerate(rows):
+        if (
+            quantity <= 0 or
+            unit_price <= 0 or
+            not tid.startswith('T') or
+            not product_ok[pc] or
+            not customer_ok[cc] or
+            not region_ok[rc]
+        ):
+            invalid_count += 1
+            continue
+
+        valid_indices.append(i)
+        amounts.append(quantity * unit_price)
+        region_codes.add(rc)
+
+    if verbose:
+        print("Available Regions:", sorted(dictionaries['Region'][rc] for rc in region_codes))
+        if amounts:
+            print("Transaction Amount Range:", min(amounts), "to", max(amounts))
+
+    filtered_by_region = 0
+    filtered_by_amount = 0
+
+    selected = list(range(len(valid_indices)))
+
+    if region:
+        before = len(selected)
+        region_code = table.code_of('Region', region)
+        region_column = codes['Region']
+        selected = [
+            j for j in selected
+            if region_column[valid_indices[j]] == region_code
+        ]
+        filtered_by_region = before - len(selected)
+        if verbose:
+            print("Records after region filter:", len(selected))
+
+    if min_amount is not None:
+        before = len(selected)
+        selected = [j for j in selected if amounts[j] >= min_amount]
+        filtered_by_amount += before - len(selected)
+
+    if max_amount is not None:
+        before = len(selected)
+        selected = [j for j in selected if amounts[j] <= max_amount]
+        filtered_by_amount += before - len(selected)
+
+    if min_amount is not None or max_amount is not None:
+        if verbose:
+            print("Records after amount filter:", len(selected))
+
+    filtered_by_date = 0
+
+    if start_date is not None or end_date is not None:
+        before = len(selected)
+        date_ok = _date_in_range(dictionaries['Date'], start_date, end_date)
+        date_column = codes['Date']
+        selected = [j for j in selected if date_ok[date_column[valid_indices[j]]]]
+        filtered_by_date = before - len(selected)
+        if verbose:
+            print("Records after date filter:", len(selected))
+
+    valid_table = table.take([valid_indices[j] for j in selected])
+    valid_table.amount = array('d', [amounts[j] for j in selected])
+
+    summary = {
+        'total_input': len(table),
+        'invalid': invalid_count,
+        'filtered_by_region': filtered_by_region,
+        'filtered_by_amount': filtered_by_amount,
+        'filtered_by_date': filtered_by_date,
+        'final_count': len(valid_table)
+    }
+
+    return valid_table, invalid_count, summary
+
+def _validate_and_filter_vectorized(table, region, min_amount, max_amount, verbose=True,
+                                    start_date=None, end_date=None):
+    dictionaries = table.dictionaries
+    codes = table.codes
+
+    quantity = np.frombuffer(table.quantity, dtype='q')
+    unit_price = np.frombuffer(table.unit_price, dtype='d')
+    product_codes = np.frombuffer(codes['ProductID'], dtype='I')
+    customer_codes = np.frombuffer(codes['CustomerID'], dtype='I')
+    region_codes = np.frombuffer(codes['Region'], dtype='I')
+
+    product_ok = np.array([p.startswith('P') for p in dictionaries['ProductID']], dtype=bool)
+    customer_ok = np.array([c.startswith('C') for c in dictionaries['CustomerID']], dtype=bool)
+    region_ok = np.array([bool(r) for r in dictionaries['Region']], dtype=bool)
+    tid_ok = np.char.startswith(np.array(table.transaction_ids, dtype=str), 'T')
+
+    valid = (quantity > 0) & (unit_price > 0) & tid_ok
+    if len(table):
+        valid &= product_ok[product_codes] & customer_ok[customer_codes] & region_ok[region_codes]
+
+    invalid_count = len(table) - int(valid.sum())
+    amount = quantity * unit_price
+
+    valid_amounts = amount[valid]
+    if verbose:
+        print("Available Regions:", sorted(
+            dictionaries['Region'][rc] for rc in np.unique(region_codes[valid])
+        ))
+        if valid_amounts.size:
+            print("Transaction Amount Range:", float(valid_amounts.min()), "to", float(valid_amounts.max()))
+
+    filtered_by_region = 0
+    filtered_by_amount = 0
+
+    mask = valid
+
+    if region:
+        before = int(mask.sum())
+        region_code = table.code_of('Region', region)
+        if region_code is None:
+            mask = np.zeros_like(mask)
+        else:
+            mask = mask & (region_codes == region_code)
+        filtered_by_region = before - int(mask.sum())
+        if verbose:
+            print("Records after region filter:", int(mask.sum()))
+
+    if min_amount is not None or max_amount is not None:
+        before = int(mask.sum())
+        if min_amount is not None:
+            mask = mask & (amount >= min_amount)
+        if max_amount is not None:
+            mask = mask & (amount <= max_amount)
+        filtered_by_amount = before - int(mask.sum())
+        if verbose:
+            print("Records after amount filter:", int(mask.sum()))
+
+    filtered_by_date = 0
+
+    if start_date is not None or end_date is not None:
+        before = int(mask.sum())
+        date_ok = np.array(_date_in_range(dictionaries['Date'], start_date, end_date), dtype=bool)
+        if len(table):
+            mask = mask & date_ok[np.frombuffer(codes['Date'], dtype='I')]
+        filtered_by_date = before - int(mask.sum())
+        if verbose:
+            print("Records after date filter:", int(mask.sum()))
+
+    selected = np.flatnonzero(mask)
+    valid_table = table.take(selected)
+    valid_table.amount = array('d')
+    valid_table.amount.frombytes(amount[selected].tobytes())
+
+    summary = {
+        'total_input': len(table),
+        'invalid': invalid_count,
+        'filtered_by_region': filtered_by_region,
+        'filtered_by_amount': filtered_by_amount,
+        'filtered_by_date': filtered_by_date,
+        'final_count': len(valid_table)
+    }
+
+    return valid_table, invalid_count, summary
+
+# Grouped parts of the aggregates: key column, and the column whose
+# distinct values each group keeps (if any).
+AGGREGATE_DIMENSIONS = {
+    'regions': ('Region', None),
+    'products': ('ProductName', None),
+    'customers': ('CustomerID', 'ProductName'),
+    'daily': ('Date', 'CustomerID')
+}
+
+def new_aggregates(distinct='exact', customer_error=0.01, product_error=0.1):
+    # distinct='hll' keeps HyperLogLog sketches instead of sets for the
+    # unique customers per day (customer_error) and the unique products per
+    # customer (product_error), so memory per bucket stays fixed.
+    aggregates = {
+        'total_revenue': 0.0,
+        'transaction_count': 0,
+        'regions': {},
+        'products': {},
+        'customers': {},
+        'daily': {}
+    }
+
+    if distinct == 'hll':
+        aggregates['distinct'] = {
+            'customer_error': customer_error,
+            'product_error': product_error
+        }
+
+    return aggregates
+
+def _new_distinct(aggregates, kind):
+    sketch_options = aggregates.get('distinct')
+    if sketch_options is None:
+        return set()
+    return HyperLogLog(sketch_options[kind + '_error'])
+
+@profiled
+def update_aggregates(aggregates, transactions):
+    if isinstance(transactions, TransactionTable):
+        return _update_aggregates_table(aggregates, transactions)
+
+    regions = aggregates['regions']
+    products = aggregates['products']
+    customers = aggregates['customers']
+    daily = aggregates['daily']
+
+    total_revenue = aggregates['total_revenue']
+    transaction_count = aggregates['transaction_count']
 
     for tx in transactions:
+        quantity = tx['Quantity']
+        amount = quantity * tx['UnitPrice']
         region = tx['Region']
-        amount = tx['Quantity'] * tx['UnitPrice']
-        total_sales += amount
+        product = tx['ProductName']
+        customer = tx['CustomerID']
+        date = tx['Date']
+
+        total_revenue += amount
+        transaction_count += 1
 
-        if region not in region_data:
-            region_data[region] = {
+        region_data = regions.get(region)
+        if region_data is None:
+            region_data = regions[region] = {
                 'total_sales': 0.0,
                 'transaction_count': 0
             }
+        region_data['total_sales'] += amount
+        region_data['transaction_count'] += 1
 
-        region_data[region]['total_sales'] += amount
-        region_data[region]['transaction_count'] += 1
+        product_data = products.get(product)
+        if product_data is None:
+            product_data = products[product] = {
+                'total_quantity': 0,
+                'total_revenue': 0.0
+            }
+        product_data['total_quantity'] += quantity
+        product_data['total_revenue'] += amount
 
-    for region in region_data:
-        percentage = (region_data[region]['total_sales'] / total_sales) * 100
-        region_data[region]['percentage'] = round(percentage, 2)
+        customer_data = customers.get(customer)
+        if customer_data is None:
+            customer_data = customers[customer] = {
+                'total_spent': 0.0,
+                'purchase_count': 0,
+                'products_bought': _new_distinct(aggregates, 'product')
+            }
+        customer_data['total_spent'] += amount
+        customer_data['purchase_count'] += 1
+        customer_data['products_bought'].add(product)
+
+        day_data = daily.get(date)
+        if day_data is None:
+            day_data = daily[date] = {
+                'revenue': 0.0,
+                'transaction_count': 0,
+                'unique_customers': _new_distinct(aggregates, 'customer')
+            }
+        day_data['revenue'] += amount
+        day_data['transaction_count'] += 1
+        day_data['unique_customers'].add(customer)
+
+    aggregates['total_revenue'] = total_revenue
+    aggregates['transaction_count'] = transaction_count
+
+    return aggregates
+
+def _update_aggregates_table(aggregates, table):
+    regions = aggregates['regions']
+    products = aggregates['products']
+    customers = aggregates['customers']
+    daily = aggregates['daily']
+
+    dictionaries = table.dictionaries
+    region_names = dictionaries['Region']
+    product_names = dictionaries['ProductName']
+    customer_ids = dictionaries['CustomerID']
+    dates = dictionaries['Date']
+
+    # Group entries are resolved per code on first sight, so each row does a
+    # list index instead of hashing strings, and rows are still folded in
+    # input order.
+    region_entries = [None] * len(region_names)
+    product_entries = [None] * len(product_names)
+    customer_entries = [None] * len(customer_ids)
+    day_entries = [None] * len(dates)
+
+    total_revenue = aggregates['total_revenue']
+    transaction_count = aggregates['transaction_count']
+
+    codes = table.codes
+    rows = zip(
+        table.quantity, table.unit_price, codes['Region'],
+        codes['ProductName'], codes['CustomerID'], codes['Date']
+    )
+
+    for quantity, unit_price, rc, pc, cc, dc in rows:
+        amount = quantity * unit_price
+
+        total_revenue += amount
+        transaction_count += 1
+
+        region_data = region_entries[rc]
+        if region_data is None:
+            region_data = region_entries[rc] = regions.setdefault(
+                region_names[rc], {'total_sales': 0.0, 'transaction_count': 0}
+            )
+        region_data['total_sales'] += amount
+        region_data['transaction_count'] += 1
+
+        product_data = product_entries[pc]
+        if product_data is None:
+            product_data = product_entries[pc] = products.setdefault(
+                product_names[pc], {'total_quantity': 0, 'total_revenue': 0.0}
+            )
+        product_data['total_quantity'] += quantity
+        product_data['total_revenue'] += amount
+
+        customer_data = customer_entries[cc]
+        if customer_data is None:
+            customer_data = customer_entries[cc] = customers.setdefault(
+                customer_ids[cc],
+                {'total_spent': 0.0, 'purchase_count': 0,
+                 'products_bought': _new_distinct(aggregates, 'product')}
+            )
+        customer_data['total_spent'] += amount
+        customer_data['purchase_count'] += 1
+        customer_data['products_bought'].add(product_names[pc])
+
+        day_data = day_entries[dc]
+        if day_data is None:
+            day_data = day_entries[dc] = daily.setdefault(
+                dates[dc],
+                {'revenue': 0.0, 'transaction_count': 0,
+                 'unique_customers': _new_distinct(aggregates, 'customer')}
+            )
+        day_data['revenue'] += amount
+        day_data['transaction_count'] += 1
+        day_data['unique_customers'].add(customer_ids[cc])
+
+    aggregates['total_revenue'] = total_revenue
+    aggregates['transaction_count'] = transaction_count
+
+    return aggregates
+
+@profiled
+def aggregate_sales(transactions, distinct='exact', customer_error=0.01, product_error=0.1):
+    # One pass builds every grouping the analytics functions and the report need
+    return update_aggregates(
+        new_aggregates(distinct, customer_error, product_error), transactions
+    )
+
+def merge_aggregates(target, other):
+    # Folds the partial aggregates in other into target (other's entries
+    # may be taken over, so it should not be used afterwards). Associative,
+    # so partials can be combined in any grouping.
+    target['total_revenue'] += other['total_revenue']
+    target['transaction_count'] += other['transaction_count']
+
+    for dimension in AGGREGATE_DIMENSIONS:
+        entries = target[dimension]
+        for key, entry in other[dimension].items():
+            current = entries.get(key)
+            if current is None:
+                entries[key] = entry
+                continue
+
+            for field, value in entry.items():
+                if isinstance(value, HyperLogLog):
+                    current[field].merge(value)
+                elif isinstance(value, set):
+                    current[field] |= value
+                else:
+                    current[field] += value
+
+    return target
+
+class _InsertionOrderedSet(dict):
+    # Stand-in for the distinct-value sets inside worker processes: a set's
+    # iteration order depends on its insertion history, which pickling does
+    # not keep, so values travel in first-seen order and the set is rebuilt
+    # by _rebuild_sets as the serial pass would have built it.
+    def add(self, value):
+        self[value] = None
+
+def _rebuild_sets(aggregates, dimension):
+    for entry in aggregates[dimension].values():
+        for field, value in entry.items():
+            if isinstance(value, _InsertionOrderedSet):
+                rebuilt = set()
+                for item in value:
+                    rebuilt.add(item)
+                entry[field] = rebuilt
+
+def _aggregate_partition(dimension, quantity, unit_price, key_codes, keys, member_codes, members, sketch_options):
+    # Partial aggregates for one dimension over the rows of one partition.
+    aggregates = new_aggregates()
+    if sketch_options is not None:
+        aggregates['distinct'] = sketch_options
+        new_distinct = _new_distinct
+    else:
+        new_distinct = lambda aggregates, kind: _InsertionOrderedSet()
+
+    entries = aggregates[dimension]
+    quantity = quantity.tolist()
+    unit_price = unit_price.tolist()
+    key_codes = key_codes.tolist()
+
+    if dimension == 'regions':
+        for q, p, kc in zip(quantity, unit_price, key_codes):
+            amount = q * p
+            entry = entries.get(keys[kc])
+            if entry is None:
+                entry = entries[keys[kc]] = {'total_sales': 0.0, 'transaction_count': 0}
+            entry['total_sales'] += amount
+            entry['transaction_count'] += 1
+
+    elif dimension == 'products':
+        for q, p, kc in zip(quantity, unit_price, key_codes):
+            amount = q * p
+            entry = entries.get(keys[kc])
+            if entry is None:
+                entry = entries[keys[kc]] = {'total_quantity': 0, 'total_revenue': 0.0}
+            entry['total_quantity'] += q
+            entry['total_revenue'] += amount
+
+    elif dimension == 'customers':
+        for q, p, kc, mc in zip(quantity, unit_price, key_codes, member_codes.tolist()):
+            amount = q * p
+            entry = entries.get(keys[kc])
+            if entry is None:
+                entry = entries[keys[kc]] = {
+                    'total_spent': 0.0,
+                    'purchase_count': 0,
+                    'products_bought': new_distinct(aggregates, 'product')
+                }
+            entry['total_spent'] += amount
+            entry['purchase_count'] += 1
+            entry['products_bought'].add(members[mc])
+
+    else:
+        for q, p, kc, mc in zip(quantity, unit_price, key_codes, member_codes.tolist()):
+            amount = q * p
+            entry = entries.get(keys[kc])
+            if entry is None:
+                entry = entries[keys[kc]] = {
+                    'revenue': 0.0,
+                    'transaction_count': 0,
+                    'unique_customers': new_distinct(aggregates, 'customer')
+                }
+            entry['revenue'] += amount
+            entry['transaction_count'] += 1
+            entry['unique_customers'].add(members[mc])
+
+    return aggregates
+
+@profiled
+def aggregate_sales_parallel(transactions, workers=None, distinct='exact', customer_error=0.01, product_error=0.1):
+    # Map-reduce form of aggregate_sales. Each dimension is partitioned by
+    # key (code % workers), so every group is folded by one worker over its
+    # rows in input order; float sums, sets and sketches come out exactly as
+    # in the serial pass. Partials are combined with merge_aggregates and
+    # groups put back in order of first appearance.
+    workers = workers or os.cpu_count() or 1
+
+    if not isinstance(transactions, TransactionTable):
+        transactions = TransactionTable.from_records(transactions)
+
+    if workers <= 1 or np is None or not len(transactions):
+        return aggregate_sales(transactions, distinct, customer_error, product_error)
+
+    aggregates = new_aggregates(distinct, customer_error, product_error)
+    sketch_options = aggregates.get('distinct')
+
+    codes = transactions.codes
+    dictionaries = transactions.dictionaries
+    quantity = np.frombuffer(transactions.quantity, dtype='q')
+    unit_price = np.frombuffer(transactions.unit_price, dtype='d')
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=disable_profiling) as executor:
+        futures = []
+
+        for dimension, (key_column, member_column) in AGGREGATE_DIMENSIONS.items():
+            key_codes = np.frombuffer(codes[key_column], dtype='I')
+            member_codes = np.frombuffer(codes[member_column], dtype='I') if member_column else None
+            members = dictionaries[member_column] if member_column else None
+
+            for partition in range(workers):
+                rows = np.flatnonzero(key_codes % workers == partition)
+                if not len(rows):
+                    continue
+                futures.append((dimension, executor.submit(
+                    _aggregate_partition, dimension,
+                    quantity[rows], unit_price[rows], key_codes[rows], dictionaries[key_column],
+                    None if member_codes is None else member_codes[rows], members, sketch_options
+                )))
+
+        # The grand total is one sequential fold, as in the serial loop
+        # (cumsum adds left to right, unlike the pairwise np.sum).
+        amounts = np.concatenate(([0.0], quantity * unit_price))
+        total_revenue = float(np.cumsum(amounts)[-1])
+
+        for dimension, future in futures:
+            partial = future.result()
+            _rebuild_sets(partial, dimension)
+            merge_aggregates(aggregates, partial)
+
+    aggregates['total_revenue'] = total_revenue
+    aggregates['transaction_count'] = len(transactions)
+
+    for dimension, (key_column, _) in AGGREGATE_DIMENSIONS.items():
+        key_codes = np.frombuffer(codes[key_column], dtype='I')
+        present, first_seen = np.unique(key_codes, return_index=True)
+        keys = dictionaries[key_column]
+        entries = aggregates[dimension]
+        aggregates[dimension] = {
+            keys[code]: entries[keys[code]]
+            for code in present[np.argsort(first_seen, kind='stable')].tolist()
+        }
+
+    return aggregates
+
+@profiled
+def calculate_total_revenue(transactions, aggregates=None):
+    if aggregates is None:
+        aggregates = aggregate_sales(transactions)
+
+    return aggregates['total_revenue']
+
+@profiled
+def region_wise_sales(transactions, aggregates=None):
+    if aggregates is None:
+        aggregates = aggregate_sales(transactions)
+
+    total_sales = aggregates['total_revenue']
+    region_data = {}
+
+    for region, data in aggregates['regions'].items():
+        percentage = (data['total_sales'] / total_sales) * 100
+        region_data[region] = {
+            'total_sales': data['total_sales'],
+            'transaction_count': data['transaction_count'],
+            'percentage': round(percentage, 2)
+        }
 
     sorted_regions = dict(
         sorted(
@@ -146,60 +865,58 @@ def region_wise_sales(transactions):
 
     return sorted_regions
 
-def top_selling_products(transactions, n=5):
-    product_data = {}
-
-    for tx in transactions:
-        product = tx['ProductName']
-        quantity = tx['Quantity']
-        revenue = tx['Quantity'] * tx['UnitPrice']
+@profiled
+def top_selling_products(transactions, n=5, aggregates=None):
+    if aggregates is None:
+        aggregates = aggregate_sales(transactions)
 
-        if product not in product_data:
-            product_data[product] = {
-                'total_quantity': 0,
-                'total_revenue': 0.0
-            }
-
-        product_data[product]['total_quantity'] += quantity
-        product_data[product]['total_revenue'] += revenue
-
-    product_list = [
+    product_list = (
         (product,
          data['total_quantity'],
          data['total_revenue'])
-        for product, data in product_data.items()
-    ]
+        for product, data in aggregates['products'].items()
+    )
 
-    product_list.sort(key=lambda x: x[1], reverse=True)
+    return top_k(product_list, n, key=lambda x: x[1])
 
-    return product_list[:n]
-def customer_analysis(transactions):
-    customer_data = {}
+@profiled
+def stream_top_products(transactions, n=5, capacity=1000):
+    # Approximate top products by quantity in fixed memory, for streams
+    # too large to aggregate exactly. Returns (product, estimated_quantity,
+    # max_overcount) tuples.
+    sketch = SpaceSaving(capacity)
 
     for tx in transactions:
-        customer = tx['CustomerID']
-        amount = tx['Quantity'] * tx['UnitPrice']
-        product = tx['ProductName']
+        sketch.update(tx['ProductName'], tx['Quantity'])
 
-        if customer not in customer_data:
-            customer_data[customer] = {
-                'total_spent': 0.0,
-                'purchase_count': 0,
-                'products_bought': set()
-            }
+    return sketch.top(n)
+@profiled
+def customer_analysis(transactions, aggregates=None, top_n=None):
+    if aggregates is None:
+        aggregates = aggregate_sales(transactions)
 
-        customer_data[customer]['total_spent'] += amount
-        customer_data[customer]['purchase_count'] += 1
-        customer_data[customer]['products_bought'].add(product)
+    customers = aggregates['customers'].items()
+    if top_n is not None:
+        # Only the best customers are selected and built, not every one.
+        customers = top_k(customers, top_n, key=lambda x: x[1]['total_spent'])
 
-    for customer in customer_data:
-        total = customer_data[customer]['total_spent']
-        count = customer_data[customer]['purchase_count']
+    customer_data = {}
 
-        customer_data[customer]['avg_order_value'] = round(total / count, 2)
-        customer_data[customer]['products_bought'] = list(
-            customer_data[customer]['products_bought']
-        )
+    for customer, data in customers:
+        total = data['total_spent']
+        count = data['purchase_count']
+
+        customer_data[customer] = {
+            'total_spent': total,
+            'purchase_count': count,
+            'avg_order_value': round(total / count, 2)
+        }
+
+        # A sketch can only count its products, not list them.
+        if isinstance(data['products_bought'], HyperLogLog):
+            customer_data[customer]['unique_products'] = len(data['products_bought'])
+        else:
+            customer_data[customer]['products_bought'] = list(data['products_bought'])
 
     sorted_customers = dict(
         sorted(
@@ -211,36 +928,49 @@ def customer_analysis(transactions):
 
     return sorted_customers
 
-def daily_sales_trend(transactions):
+@profiled
+def daily_sales_trend(transactions, aggregates=None):
+    if aggregates is None:
+        aggregates = aggregate_sales(transactions)
+
     daily_data = {}
 
-    for tx in transactions:
-        date = tx['Date']
-        amount = tx['Quantity'] * tx['UnitPrice']
-        customer = tx['CustomerID']
+    for date, data in aggregates['daily'].items():
+        daily_data[date] = {
+            'revenue': data['revenue'],
+            'transaction_count': data['transaction_count'],
+            'unique_customers': len(data['unique_customers'])
+        }
 
-        if date not in daily_data:
-            daily_data[date] = {
-                'revenue': 0.0,
-                'transaction_count': 0,
-                'unique_customers': set()
-            }
+    sorted_daily_data = dict(sorted(daily_data.items()))
 
-        daily_data[date]['revenue'] += amount
-        daily_data[date]['transaction_count'] += 1
-        daily_data[date]['unique_customers'].add(customer)
+    return sorted_daily_data
 
-    for date in daily_data:
-        daily_data[date]['unique_customers'] = len(
-            daily_data[date]['unique_customers']
-        )
+@profiled
+def unique_customers_by_period(transactions, period='week', aggregates=None):
+    # Rolls the daily unique-customer sets or sketches up to weeks or months
+    # by union / sketch merge, so a customer seen on several days of the
+    # period is counted once.
+    if aggregates is None:
+        aggregates = aggregate_sales(transactions)
 
-    sorted_daily_data = dict(sorted(daily_data.items()))
+    merged = {}
+    for date, data in sorted(aggregates['daily'].items()):
+        key = period_key(date, period)
+        customers = data['unique_customers']
 
-    return sorted_daily_data
+        if key not in merged:
+            merged[key] = customers.copy()
+        elif isinstance(customers, HyperLogLog):
+            merged[key].merge(customers)
+        else:
+            merged[key] |= customers
+
+    return {key: len(customers) for key, customers in merged.items()}
 
-def find_peak_sales_day(transactions):
-    daily_trends = daily_sales_trend(transactions)
+@profiled
+def find_peak_sales_day(transactions, aggregates=None):
+    daily_trends = daily_sales_trend(transactions, aggregates)
 
     peak_date = None
     peak_revenue = 0.0
@@ -254,26 +984,14 @@ def find_peak_sales_day(transactions):
 
     return peak_date, peak_revenue, peak_transactions
 
-def low_performing_products(transactions, threshold=10):
-    product_data = {}
-
-    for tx in transactions:
-        product = tx['ProductName']
-        quantity = tx['Quantity']
-        revenue = tx['Quantity'] * tx['UnitPrice']
-
-        if product not in product_data:
-            product_data[product] = {
-                'total_quantity': 0,
-                'total_revenue': 0.0
-            }
-
-        product_data[product]['total_quantity'] += quantity
-        product_data[product]['total_revenue'] += revenue
+@profiled
+def low_performing_products(transactions, threshold=10, aggregates=None):
+    if aggregates is None:
+        aggregates = aggregate_sales(transactions)
 
     low_products = []
 
-    for product, data in product_data.items():
+    for product, data in aggregates['products'].items():
         if data['total_quantity'] < threshold:
             low_products.append(
                 (product, data['total_quantity'], data['total_revenue'])
@@ -283,153 +1001,21 @@ def low_performing_products(transactions, threshold=10):
 
     return low_products
 
-from datetime import datetime
-
 
-def generate_sales_report(transactions, enriched_transactions, output_file='output/sales_report.txt'):
-    def money(value):
-        return f"{value:,.2f}"
+@profiled
+def generate_sales_report(transactions, enriched_transactions, output_file='output/sales_report.txt',
+                          aggregates=None, output_format='text'):
+    # Aggregation (skipped when aggregates are passed in) and enrichment
+    # counts first; rendering then only reads the report data and writes
+    # it in one go, whatever the number of rows.
+    if aggregates is None:
+        aggregates = aggregate_sales(transactions)
 
-    total_revenue = sum(tx['Quantity'] * tx['UnitPrice'] for tx in transactions)
-    total_transactions = len(transactions)
-    avg_order_value = total_revenue / total_transactions if total_transactions else 0
-
-    dates = sorted(tx['Date'] for tx in transactions)
-    date_range = (dates[0], dates[-1]) if dates else ("N/A", "N/A")
-
-    # Region-wise summary
-    region_summary = {}
-    for tx in transactions:
-        region = tx['Region']
-        amount = tx['Quantity'] * tx['UnitPrice']
-        region_summary.setdefault(region, {'sales': 0, 'count': 0})
-        region_summary[region]['sales'] += amount
-        region_summary[region]['count'] += 1
-
-    for r in region_summary:
-        region_summary[r]['percentage'] = (region_summary[r]['sales'] / total_revenue) * 100
-
-    region_summary = dict(
-        sorted(region_summary.items(), key=lambda x: x[1]['sales'], reverse=True)
-    )
-
-    # Top products
-    product_data = {}
-    for tx in transactions:
-        product = tx['ProductName']
-        amount = tx['Quantity'] * tx['UnitPrice']
-        product_data.setdefault(product, {'qty': 0, 'revenue': 0})
-        product_data[product]['qty'] += tx['Quantity']
-        product_data[product]['revenue'] += amount
-
-    top_products = sorted(
-        product_data.items(),
-        key=lambda x: x[1]['qty'],
-        reverse=True
-    )[:5]
-
-    # Top customers
-    customer_data = {}
-    for tx in transactions:
-        cid = tx['CustomerID']
-        amount = tx['Quantity'] * tx['UnitPrice']
-        customer_data.setdefault(cid, {'spent': 0, 'count': 0})
-        customer_data[cid]['spent'] += amount
-        customer_data[cid]['count'] += 1
-
-    top_customers = sorted(
-        customer_data.items(),
-        key=lambda x: x[1]['spent'],
-        reverse=True
-    )[:5]
-
-    # Daily sales trend
-    daily_data = {}
-    for tx in transactions:
-        date = tx['Date']
-        amount = tx['Quantity'] * tx['UnitPrice']
-        daily_data.setdefault(date, {'revenue': 0, 'count': 0, 'customers': set()})
-        daily_data[date]['revenue'] += amount
-        daily_data[date]['count'] += 1
-        daily_data[date]['customers'].add(tx['CustomerID'])
-
-    daily_data = dict(sorted(daily_data.items()))
-
-    peak_day = max(daily_data.items(), key=lambda x: x[1]['revenue'])
-
-    # Low performing products
-    low_products = [
-        (p, d['qty'], d['revenue'])
-        for p, d in product_data.items()
-        if d['qty'] < 10
-    ]
-
-    # API enrichment summary
-    enriched_success = [tx for tx in enriched_transactions if tx.get('API_Match')]
-    enriched_failed = [tx['ProductName'] for tx in enriched_transactions if not tx.get('API_Match')]
-    enrichment_rate = (len(enriched_success) / len(enriched_transactions)) * 100 if enriched_transactions else 0
+    report = build_report_data(aggregates, enrichment_summary(enriched_transactions))
+    content = render_report(report, output_format)
 
     with open(output_file, 'w', encoding='utf-8') as f:
-        f.write("=" * 70 + "\n")
-        f.write("SALES ANALYTICS REPORT\n")
-        f.write(f"Generated: {datetime.now()}\n")
-        f.write(f"Records Processed: {total_transactions}\n")
-        f.write("=" * 70 + "\n\n")
-
-        f.write("OVERALL SUMMARY\n")
-        f.write(f"Total Revenue: {money(total_revenue)}\n")
-        f.write(f"Total Transactions: {total_transactions}\n")
-        f.write(f"Average Order Value: {money(avg_order_value)}\n")
-        f.write(f"Date Range: {date_range[0]} to {date_range[1]}\n\n")
-
-        f.write("REGION-WISE PERFORMANCE\n")
-        for region, data in region_summary.items():
-            f.write(
-                f"{region}: Sales={money(data['sales'])}, "
-                f"Transactions={data['count']}, "
-                f"Percentage={data['percentage']:.2f}%\n"
-            )
-        f.write("\n")
-
-        f.write("TOP 5 PRODUCTS\n")
-        for i, (product, data) in enumerate(top_products, 1):
-            f.write(
-                f"{i}. {product} | Quantity={data['qty']} | Revenue={money(data['revenue'])}\n"
-            )
-        f.write("\n")
-
-        f.write("TOP 5 CUSTOMERS\n")
-        for i, (cid, data) in enumerate(top_customers, 1):
-            f.write(
-                f"{i}. {cid} | Spent={money(data['spent'])} | Orders={data['count']}\n"
-            )
-        f.write("\n")
-
-        f.write("DAILY SALES TREND\n")
-        for date, data in daily_data.items():
-            f.write(
-                f"{date} | Revenue={money(data['revenue'])} | "
-                f"Transactions={data['count']} | "
-                f"Unique Customers={len(data['customers'])}\n"
-            )
-        f.write("\n")
-
-        f.write("PRODUCT PERFORMANCE ANALYSIS\n")
-        f.write(
-            f"Best Selling Day: {peak_day[0]} "
-            f"({money(peak_day[1]['revenue'])})\n"
-        )
-        f.write("Low Performing Products:\n")
-        for p in low_products:
-            f.write(f"- {p[0]} | Qty={p[1]} | Revenue={money(p[2])}\n")
-        f.write("\n")
-
-        f.write("API ENRICHMENT SUMMARY\n")
-        f.write(f"Total Enriched Successfully: {len(enriched_success)}\n")
-        f.write(f"Success Rate: {enrichment_rate:.2f}%\n")
-        f.write("Products Not Enriched:\n")
-        for p in set(enriched_failed):
-            f.write(f"- {p}\n")
+        f.write(content)
 
     print(f"Sales report generated at {output_file}")
 
@@ -1,25 +1,121 @@
-def read_sales_data(filename):
-    encodings = ['utf-8', 'latin-1', 'cp1252']
-    lines = []
+import codecs
+import io
+import mmap
+import os
 
-    for encoding in encodings:
-        try:
-            with open(filename, 'r', encoding=encoding) as file:
-                all_lines = file.readlines()
 
-                for line in all_lines[1:]:
-                    line = line.strip()
-                    if line:
-                        lines.append(line)
+ENCODINGS = ['utf-8', 'latin-1', 'cp1252']
+SAMPLE_SIZE = 64 * 1024
 
-            return lines
 
+def detect_encoding(filename, sample_size=SAMPLE_SIZE):
+    with open(filename, 'rb') as file:
+        sample = file.read(sample_size)
+
+    for encoding in ENCODINGS:
+        try:
+            # A multi-byte character may be cut at the end of the sample,
+            # so only complete characters have to decode.
+            decoder = codecs.getincrementaldecoder(encoding)()
+            decoder.decode(sample, final=False)
+            return encoding
         except UnicodeDecodeError:
             continue
 
-        except FileNotFoundError:
-            print(f"Error: File '{filename}' not found.")
-            return []
+    return None
+
+
+def stream_sales_data(filename):
+    try:
+        encoding = detect_encoding(filename)
+    except FileNotFoundError:
+        print(f"Error: File '{filename}' not found.")
+        return
+
+    if encoding is None:
+        print("Error: Unable to read file with supported encodings.")
+        return
+
+    # The encoding is chosen from a sample, so a stray byte further down a
+    # large file is replaced instead of aborting a half-consumed stream.
+    with open(filename, 'r', encoding=encoding, errors='replace') as file:
+        next(file, None)  # skip header
+
+        for line in file:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def read_sales_data(filename):
+    return list(stream_sales_data(filename))
+
+
+def split_file_ranges(filename, chunk_count):
+    # Byte ranges covering the data lines (header excluded), each starting
+    # at the beginning of a line so no record is split between chunks.
+    with open(filename, 'rb') as file:
+        file.readline()  # skip header
+        data_start = file.tell()
+        file_size = os.fstat(file.fileno()).st_size
+
+        chunk_count = max(1, chunk_count)
+        chunk_size = max(1, (file_size - data_start) // chunk_count)
+
+        boundaries = [data_start]
+        for k in range(1, chunk_count):
+            file.seek(data_start + k * chunk_size - 1)
+            file.readline()
+            position = file.tell()
+            if boundaries[-1] < position < file_size:
+                boundaries.append(position)
+        boundaries.append(file_size)
+
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def read_line_range(filename, start, end, encoding='utf-8'):
+    with open(filename, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+
+    # StringIO applies the same universal-newline splitting as text mode.
+    text = io.StringIO(data.decode(encoding, errors='replace'), newline=None)
+
+    for line in text:
+        line = line.strip()
+        if line:
+            yield line
+
+
+def iter_mmap_fields(filename):
+    # Yields the raw byte fields of each data line straight from a
+    # read-only memory map; decoding is left to the caller.
+    with open(filename, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            mm.readline()  # skip header
+
+            for line in iter(mm.readline, b''):
+                line = line.strip()
+                if line:
+                    yield line.split(b'|')
+
+
+def data_start_offset(filename):
+    with open(filename, 'rb') as file:
+        file.readline()  # header
+        return file.tell()
+
+
+def save_rejected_lines(rejected, filename):
+    # (line, reason) pairs from the parser, one "reason<TAB>line" per row.
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
 
-    print("Error: Unable to read file with supported encodings.")
-    return []
+    with open(filename, 'w', encoding='utf-8') as file:
+        for line, reason in rejected:
+            file.write(f"{reason}\t{line}\n")
@@ -0,0 +1,162 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _argsort(values):
+    # Row positions ordered by value; ties keep row order.
+    if np is not None:
+        order = np.argsort(np.asarray(values), kind='stable')
+        return array('I', order.astype('I').tobytes())
+    return array('I', sorted(range(len(values)), key=values.__getitem__))
+
+
+def _intersect(rows, other):
+    if np is not None:
+        common = np.intersect1d(
+            np.frombuffer(rows, dtype='I'), np.frombuffer(other, dtype='I'), assume_unique=True
+        )
+        return array('I', common.tobytes())
+    keep = set(other)
+    return array('I', [row for row in rows if row in keep])
+
+
+def _merge_sorted(order, values, rows, new_values):
+    # Merges rows appended after the indexed ones into a stable sort order:
+    # each goes after the rows with an equal value, as a full re-sort would
+    # place it. Costs one copy of the order plus a bisect per new row.
+    merged_order = array('I')
+    merged_values = values[:0]
+    previous = 0
+
+    for value, row in sorted(zip(new_values, rows)):
+        position = bisect_right(values, value)
+        merged_order.extend(order[previous:position])
+        merged_values.extend(values[previous:position])
+        merged_order.append(row)
+        merged_values.append(value)
+        previous = position
+
+    merged_order.extend(order[previous:])
+    merged_values.extend(values[previous:])
+    return merged_order, merged_values
+
+
+class TransactionIndex:
+    # Reusable indexes over one validated TransactionTable: rows partitioned
+    # by Region, and row positions sorted by Date and by Amount for range
+    # lookups with bisect. Each filter is a lookup plus a slice.
+
+    def __init__(self, valid_table, invalid_count=0, total_input=None):
+        self.table = valid_table
+        self.invalid_count = invalid_count
+        self.total_input = len(valid_table) + invalid_count if total_input is None else total_input
+
+        region_codes = valid_table.codes['Region']
+        regions = valid_table.dictionaries['Region']
+        self.region_rows = {}
+        for row, code in enumerate(region_codes):
+            self.region_rows.setdefault(regions[code], array('I')).append(row)
+
+        dates = valid_table.dictionaries['Date']
+        row_dates = [dates[code] for code in valid_table.codes['Date']]
+        self.date_order = _argsort(row_dates)
+        self.sorted_dates = [row_dates[row] for row in self.date_order]
+
+        amount = valid_table.amount
+        self.amount_order = _argsort(amount)
+        self.sorted_amounts = array('d', [amount[row] for row in self.amount_order])
+
+    def add_rows(self, first_row, invalid_count=0):
+        # Indexes rows appended to the table in place from first_row on,
+        # giving the same indexes as building them again from scratch.
+        # invalid_count is the number of invalid lines that came with them.
+        table = self.table
+        rows = range(first_row, len(table))
+        self.invalid_count += invalid_count
+        self.total_input += len(rows) + invalid_count
+
+        region_codes = table.codes['Region']
+        regions = table.dictionaries['Region']
+        for row in rows:
+            self.region_rows.setdefault(regions[region_codes[row]], array('I')).append(row)
+
+        date_codes = table.codes['Date']
+        dates = table.dictionaries['Date']
+        self.date_order, self.sorted_dates = _merge_sorted(
+            self.date_order, self.sorted_dates, rows, [dates[date_codes[row]] for row in rows]
+        )
+
+        amount = table.amount
+        self.amount_order, self.sorted_amounts = _merge_sorted(
+            self.amount_order, self.sorted_amounts, rows, [amount[row] for row in rows]
+        )
+
+    def rows_in_region(self, region):
+        return self.region_rows.get(region, array('I'))
+
+    def rows_in_amount_range(self, min_amount=None, max_amount=None):
+        low = 0 if min_amount is None else bisect_left(self.sorted_amounts, min_amount)
+        high = len(self.sorted_amounts) if max_amount is None else bisect_right(self.sorted_amounts, max_amount)
+        return self.amount_order[low:max(low, high)]
+
+    def rows_in_date_range(self, start_date=None, end_date=None):
+        low = 0 if start_date is None else bisect_left(self.sorted_dates, start_date)
+        high = len(self.sorted_dates) if end_date is None else bisect_right(self.sorted_dates, end_date)
+        return self.date_order[low:max(low, high)]
+
+    def filter(self, region=None, min_amount=None, max_amount=None,
+               start_date=None, end_date=None, verbose=True):
+        # Same results and summary counts as validate_and_filter, applying
+        # region, then amount, then date filters.
+        rows = None
+
+        filtered_by_region = 0
+        filtered_by_amount = 0
+        filtered_by_date = 0
+
+        if region:
+            rows = self.rows_in_region(region)
+            filtered_by_region = len(self.table) - len(rows)
+            if verbose:
+                print("Records after region filter:", len(rows))
+
+        if min_amount is not None or max_amount is not None:
+            before = len(self.table) if rows is None else len(rows)
+            in_range = self.rows_in_amount_range(min_amount, max_amount)
+            rows = in_range if rows is None else _intersect(rows, in_range)
+            filtered_by_amount = before - len(rows)
+            if verbose:
+                print("Records after amount filter:", len(rows))
+
+        if start_date is not None or end_date is not None:
+            before = len(self.table) if rows is None else len(rows)
+            in_range = self.rows_in_date_range(start_date, end_date)
+            rows = in_range if rows is None else _intersect(rows, in_range)
+            filtered_by_date = before - len(rows)
+            if verbose:
+                print("Records after date filter:", len(rows))
+
+        if rows is None:
+            filtered = self.table
+        else:
+            # Back to input order so aggregates fold rows as a scan would.
+            if np is not None:
+                filtered = self.table.take(np.sort(np.frombuffer(rows, dtype='I')))
+            else:
+                filtered = self.table.take(sorted(rows))
+
+        summary = {
+            'total_input': self.total_input,
+            'invalid': self.invalid_count,
+            'filtered_by_region': filtered_by_region,
+            'filtered_by_amount': filtered_by_amount,
+            'filtered_by_date': filtered_by_date,
+            'final_count': len(filtered)
+        }
+
+        return filtered, self.invalid_count, summary
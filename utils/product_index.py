@@ -0,0 +1,141 @@
+import csv
+import json
+import os
+import re
+
+
+CROSSWALK_FILE = 'data/product_crosswalk.csv'
+
+# Sales ProductID -> catalog id rules, tried in order. A rule applies when
+# the ID has the prefix and its number lies in [start, end]; the catalog
+# id is that number plus offset. The default maps P1-P100 to catalog ids
+# 1-100, the products DummyJSON is known to serve; higher sales IDs are
+# not assumed to be the same products as any later catalog pages.
+DEFAULT_ID_RULES = [
+    {'prefix': 'P', 'start': None, 'end': 100, 'offset': 0}
+]
+
+# Minimum Dice similarity of title trigrams for a fuzzy name match.
+MIN_TITLE_SIMILARITY = 0.6
+
+
+def normalize_title(title):
+    return ' '.join(re.findall(r'[a-z0-9]+', str(title).lower()))
+
+
+def title_ngrams(title, n=3):
+    text = f" {normalize_title(title)} "
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def load_crosswalk(filename=CROSSWALK_FILE):
+    # Explicit ProductID -> catalog id pairs, from a JSON object or a CSV
+    # file with ProductID and catalog_id columns. Missing file: no pairs.
+    if not filename or not os.path.exists(filename):
+        return {}
+
+    try:
+        if filename.endswith('.json'):
+            with open(filename, encoding='utf-8') as file:
+                pairs = json.load(file)
+        else:
+            with open(filename, newline='', encoding='utf-8') as file:
+                pairs = {
+                    row['ProductID'].strip(): row['catalog_id'].strip()
+                    for row in csv.DictReader(file)
+                }
+
+        return {
+            product_id: int(catalog_id) if str(catalog_id).isdigit() else catalog_id
+            for product_id, catalog_id in pairs.items()
+        }
+
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Failed to load product crosswalk '{filename}'.")
+        print("Error:", e)
+        return {}
+
+
+class ProductIndex(dict):
+    # A product mapping (catalog id -> attributes) that also knows how to
+    # resolve sales ProductIDs to catalog ids: crosswalk first, then the
+    # offset/range rules, then fuzzy ProductName -> title matching.
+
+    def __init__(self, product_mapping=(), rules=None, crosswalk=None,
+                 fuzzy=True, min_similarity=MIN_TITLE_SIMILARITY):
+        super().__init__(product_mapping)
+        self.rules = DEFAULT_ID_RULES if rules is None else rules
+        self.crosswalk = crosswalk or {}
+        self.fuzzy = fuzzy
+        self.min_similarity = min_similarity
+        self._resolved = {}
+
+        # Trigram -> catalog ids whose normalized title contains it.
+        self._title_grams = {}
+        self._grams_by_id = {}
+        if fuzzy:
+            for catalog_id, info in self.items():
+                grams = title_ngrams(info.get('title') or '')
+                self._grams_by_id[catalog_id] = grams
+                for gram in grams:
+                    self._title_grams.setdefault(gram, []).append(catalog_id)
+
+    def _apply_rules(self, product_id):
+        for rule in self.rules:
+            prefix = rule.get('prefix', '')
+            if not product_id.startswith(prefix):
+                continue
+
+            try:
+                number = int(product_id[len(prefix):])
+            except ValueError:
+                continue
+
+            if rule.get('start') is not None and number < rule['start']:
+                continue
+            if rule.get('end') is not None and number > rule['end']:
+                continue
+
+            catalog_id = number + rule.get('offset', 0)
+            if catalog_id in self:
+                return catalog_id
+
+        return None
+
+    def match_title(self, product_name):
+        grams = title_ngrams(product_name)
+        if not grams:
+            return None
+
+        shared = {}
+        for gram in grams:
+            for catalog_id in self._title_grams.get(gram, ()):
+                shared[catalog_id] = shared.get(catalog_id, 0) + 1
+
+        best_id = None
+        best_score = self.min_similarity
+        for catalog_id, count in shared.items():
+            score = 2 * count / (len(grams) + len(self._grams_by_id[catalog_id]))
+            if score >= best_score and (best_id is None or score > best_score):
+                best_id = catalog_id
+                best_score = score
+
+        return best_id
+
+    def resolve(self, product_id, product_name=None):
+        key = (product_id, product_name)
+        if key in self._resolved:
+            return self._resolved[key]
+
+        catalog_id = self.crosswalk.get(product_id)
+        if catalog_id not in self:
+            catalog_id = self._apply_rules(product_id)
+        if catalog_id is None and self.fuzzy and product_name:
+            catalog_id = self.match_title(product_name)
+
+        self._resolved[key] = catalog_id
+        return catalog_id
+
+    def lookup(self, product_id, product_name=None):
+        catalog_id = self.resolve(product_id, product_name)
+        return None if catalog_id is None else self[catalog_id]
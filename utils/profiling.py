@@ -0,0 +1,183 @@
+import cProfile
+from contextlib import contextmanager
+from datetime import datetime
+import functools
+import json
+import os
+import time
+import tracemalloc
+
+from utils.transaction_table import TransactionTable
+
+
+PROFILE_FILE = 'output/run_profile.jsonl'
+
+_CAN_RESET_PEAK = hasattr(tracemalloc, 'reset_peak')
+
+# Profile that profiled() functions report to; None when not profiling.
+_active = None
+
+
+def _row_count(value):
+    # Rows in a transactions argument or result; None for anything else.
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    if isinstance(value, (list, TransactionTable)):
+        return len(value)
+    return None
+
+
+class RunProfile:
+    # Per-stage wall time, CPU time, row counts and (optionally) tracemalloc
+    # peak for one run, appended to a JSON lines file as each stage ends.
+    # Used as a context manager; while active, profiled() functions record
+    # themselves as stages nested under whatever stage is running.
+
+    def __init__(self, profile_file=PROFILE_FILE, trace_memory=False, cprofile_file=None):
+        self.profile_file = profile_file
+        self.trace_memory = trace_memory
+        self.cprofile_file = cprofile_file
+        self.run_id = f"{datetime.now():%Y%m%dT%H%M%S}-{os.getpid()}"
+        self.records = []
+        self.failed_stage = None
+        self._stack = []
+        self._file = None
+        self._cprofile = None
+        self._started_tracing = False
+
+    def __enter__(self):
+        global _active
+
+        if self.profile_file:
+            directory = os.path.dirname(self.profile_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.profile_file, 'a', encoding='utf-8')
+
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+        if self.cprofile_file:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+        self._run_stage = self.stage('run')
+        self._run_stage.__enter__()
+        _active = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global _active
+        _active = None
+
+        self._run_stage.__exit__(exc_type, exc, tb)
+
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.cprofile_file)
+
+        if self._started_tracing:
+            tracemalloc.stop()
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        return False
+
+    @contextmanager
+    def stage(self, name, rows_in=None, **fields):
+        # Yields the stage record; set record['rows_out'] (or any other
+        # key) inside the block to have it written with the timings.
+        record = {
+            'run_id': self.run_id,
+            'stage': name,
+            'parent': self._stack[-1]['stage'] if self._stack else None,
+            'depth': len(self._stack),
+            'started_at': datetime.now().isoformat(timespec='milliseconds'),
+            'rows_in': rows_in,
+            'rows_out': None
+        }
+        record.update(fields)
+
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            memory_start = tracemalloc.get_traced_memory()[0]
+            # The tracemalloc peak is global: remember the enclosing
+            # stage's peak so far before resetting it for this one.
+            # reset_peak() is Python 3.9+; on 3.8 only the delta between
+            # the start and end snapshots is recorded.
+            if _CAN_RESET_PEAK:
+                if self._stack:
+                    parent = self._stack[-1]
+                    parent['_peak'] = max(parent['_peak'], tracemalloc.get_traced_memory()[1])
+                tracemalloc.reset_peak()
+                record['_peak'] = 0
+
+        self._stack.append(record)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+
+        try:
+            yield record
+            record['status'] = 'ok'
+        except BaseException as e:
+            record['status'] = 'error'
+            record['error'] = f"{type(e).__name__}: {e}"
+            if self.failed_stage is None:
+                self.failed_stage = name
+            raise
+        finally:
+            record['wall_seconds'] = round(time.perf_counter() - wall_start, 6)
+            record['cpu_seconds'] = round(time.process_time() - cpu_start, 6)
+            self._stack.pop()
+
+            if tracing and tracemalloc.is_tracing():
+                current, peak = tracemalloc.get_traced_memory()
+                if _CAN_RESET_PEAK:
+                    peak = max(record.pop('_peak'), peak)
+                    record['memory_peak_bytes'] = peak - memory_start
+                    if self._stack:
+                        parent = self._stack[-1]
+                        parent['_peak'] = max(parent['_peak'], peak)
+                record['memory_delta_bytes'] = current - memory_start
+            else:
+                record.pop('_peak', None)
+
+            self._write(record)
+
+    def _write(self, record):
+        self.records.append(record)
+        if self._file is not None:
+            self._file.write(json.dumps(record, default=str) + '\n')
+            self._file.flush()
+
+
+def active_profile():
+    return _active
+
+
+def disable_profiling():
+    # Process pool initializer. Forked workers inherit the active profile
+    # and its open file; their calls are timed by the parent's stage instead.
+    global _active
+    _active = None
+
+
+def profiled(func):
+    # Records each call as a stage of the active RunProfile; a plain call
+    # when no profile is active.
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = _active
+        if profile is None:
+            return func(*args, **kwargs)
+
+        rows_in = next((count for count in map(_row_count, args) if count is not None), None)
+        with profile.stage(func.__name__, rows_in=rows_in) as record:
+            result = func(*args, **kwargs)
+            record['rows_out'] = _row_count(result)
+        return result
+
+    return wrapper
@@ -0,0 +1,335 @@
+import csv
+from datetime import datetime
+import html
+import io
+import json
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from utils.sketches import top_k
+from utils.transaction_table import TransactionTable
+
+
+REPORT_FORMATS = ['text', 'json', 'csv', 'html']
+
+
+def enrichment_summary(enriched_transactions):
+    # Matched row count and the product names that were not enriched, in
+    # first-seen order. Tables are counted per ProductID code from the
+    # API_Match lookup column instead of row by row.
+    if isinstance(enriched_transactions, TransactionTable) and 'API_Match' in enriched_transactions.lookups:
+        return _table_enrichment_summary(enriched_transactions)
+
+    total = 0
+    enriched = 0
+    not_enriched = {}
+
+    for tx in enriched_transactions:
+        total += 1
+        if tx.get('API_Match'):
+            enriched += 1
+        else:
+            not_enriched.setdefault(tx['ProductName'], None)
+
+    return {'total': total, 'enriched': enriched, 'not_enriched': list(not_enriched)}
+
+
+def _table_enrichment_summary(table):
+    key, matches = table.lookups['API_Match']
+    names = table.dictionaries['ProductName']
+    key_codes = table.codes[key]
+    name_codes = table.codes['ProductName']
+
+    if np is not None and len(table):
+        row_matched = np.array(matches, dtype=bool)[np.frombuffer(key_codes, dtype='I')]
+        failed = np.frombuffer(name_codes, dtype='I')[~row_matched]
+        codes, first_seen = np.unique(failed, return_index=True)
+        not_enriched = [names[code] for code in codes[np.argsort(first_seen)]]
+        enriched = int(row_matched.sum())
+    else:
+        enriched = 0
+        failed = {}
+        for key_code, name_code in zip(key_codes, name_codes):
+            if matches[key_code]:
+                enriched += 1
+            else:
+                failed.setdefault(name_code, None)
+        not_enriched = [names[code] for code in failed]
+
+    return {'total': len(table), 'enriched': enriched, 'not_enriched': not_enriched}
+
+
+def build_report_data(aggregates, enrichment=None, top_n=5, low_threshold=10):
+    # Everything the report shows, taken from the aggregates and an
+    # enrichment_summary. Its size depends on the number of regions,
+    # products, customers and days, not on the number of rows.
+    total_revenue = aggregates['total_revenue']
+    total_transactions = aggregates['transaction_count']
+    daily = aggregates['daily']
+
+    regions = sorted(
+        (
+            {
+                'region': region,
+                'sales': data['total_sales'],
+                'transactions': data['transaction_count'],
+                'percentage': (data['total_sales'] / total_revenue) * 100
+            }
+            for region, data in aggregates['regions'].items()
+        ),
+        key=lambda x: x['sales'],
+        reverse=True
+    )
+
+    products = aggregates['products']
+    top_products = [
+        {'product': product, 'quantity': data['total_quantity'], 'revenue': data['total_revenue']}
+        for product, data in top_k(products.items(), top_n, key=lambda x: x[1]['total_quantity'])
+    ]
+
+    top_customers = [
+        {'customer': cid, 'spent': data['total_spent'], 'orders': data['purchase_count']}
+        for cid, data in top_k(aggregates['customers'].items(), top_n, key=lambda x: x[1]['total_spent'])
+    ]
+
+    daily_trend = [
+        {
+            'date': date,
+            'revenue': data['revenue'],
+            'transactions': data['transaction_count'],
+            'unique_customers': len(data['unique_customers'])
+        }
+        for date, data in sorted(daily.items())
+    ]
+
+    # Earliest day wins a tie, as with max() over the sorted days.
+    peak_day = max(daily_trend, key=lambda x: x['revenue']) if daily_trend else None
+
+    low_products = [
+        {'product': product, 'quantity': data['total_quantity'], 'revenue': data['total_revenue']}
+        for product, data in products.items()
+        if data['total_quantity'] < low_threshold
+    ]
+
+    report = {
+        'generated': str(datetime.now()),
+        'top_n': top_n,
+        'summary': {
+            'total_revenue': total_revenue,
+            'total_transactions': total_transactions,
+            'average_order_value': total_revenue / total_transactions if total_transactions else 0,
+            'date_from': daily_trend[0]['date'] if daily_trend else 'N/A',
+            'date_to': daily_trend[-1]['date'] if daily_trend else 'N/A'
+        },
+        'regions': regions,
+        'top_products': top_products,
+        'top_customers': top_customers,
+        'daily_trend': daily_trend,
+        'peak_day': peak_day,
+        'low_products': low_products
+    }
+
+    if enrichment is not None:
+        total = enrichment['total']
+        report['enrichment'] = {
+            'enriched': enrichment['enriched'],
+            'success_rate': (enrichment['enriched'] / total) * 100 if total else 0,
+            'not_enriched': list(enrichment['not_enriched'])
+        }
+
+    return report
+
+
+def _money(value):
+    return f"{value:,.2f}"
+
+
+def _render_text(report):
+    summary = report['summary']
+    lines = [
+        "=" * 70,
+        "SALES ANALYTICS REPORT",
+        f"Generated: {report['generated']}",
+        f"Records Processed: {summary['total_transactions']}",
+        "=" * 70,
+        "",
+        "OVERALL SUMMARY",
+        f"Total Revenue: {_money(summary['total_revenue'])}",
+        f"Total Transactions: {summary['total_transactions']}",
+        f"Average Order Value: {_money(summary['average_order_value'])}",
+        f"Date Range: {summary['date_from']} to {summary['date_to']}",
+        "",
+        "REGION-WISE PERFORMANCE"
+    ]
+
+    lines.extend(
+        f"{r['region']}: Sales={_money(r['sales'])}, "
+        f"Transactions={r['transactions']}, "
+        f"Percentage={r['percentage']:.2f}%"
+        for r in report['regions']
+    )
+    lines += ["", f"TOP {report['top_n']} PRODUCTS"]
+    lines.extend(
+        f"{i}. {p['product']} | Quantity={p['quantity']} | Revenue={_money(p['revenue'])}"
+        for i, p in enumerate(report['top_products'], 1)
+    )
+    lines += ["", f"TOP {report['top_n']} CUSTOMERS"]
+    lines.extend(
+        f"{i}. {c['customer']} | Spent={_money(c['spent'])} | Orders={c['orders']}"
+        for i, c in enumerate(report['top_customers'], 1)
+    )
+    lines += ["", "DAILY SALES TREND"]
+    lines.extend(
+        f"{d['date']} | Revenue={_money(d['revenue'])} | "
+        f"Transactions={d['transactions']} | "
+        f"Unique Customers={d['unique_customers']}"
+        for d in report['daily_trend']
+    )
+
+    peak_day = report['peak_day']
+    lines += [
+        "",
+        "PRODUCT PERFORMANCE ANALYSIS",
+        f"Best Selling Day: {peak_day['date']} ({_money(peak_day['revenue'])})" if peak_day
+        else "Best Selling Day: N/A",
+        "Low Performing Products:"
+    ]
+    lines.extend(
+        f"- {p['product']} | Qty={p['quantity']} | Revenue={_money(p['revenue'])}"
+        for p in report['low_products']
+    )
+    lines.append("")
+
+    enrichment = report.get('enrichment')
+    if enrichment is not None:
+        lines += [
+            "API ENRICHMENT SUMMARY",
+            f"Total Enriched Successfully: {enrichment['enriched']}",
+            f"Success Rate: {enrichment['success_rate']:.2f}%",
+            "Products Not Enriched:"
+        ]
+        lines.extend(f"- {name}" for name in enrichment['not_enriched'])
+
+    return "\n".join(lines) + "\n"
+
+
+def _render_json(report):
+    return json.dumps(report, indent=2) + "\n"
+
+
+def _render_csv(report):
+    # Long format, one value per row: section, item, field, value.
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(['section', 'item', 'field', 'value'])
+
+    writer.writerow(['report', '', 'generated', report['generated']])
+    writer.writerow(['report', '', 'top_n', report['top_n']])
+    for field, value in report['summary'].items():
+        writer.writerow(['summary', '', field, value])
+
+    for section, item_key in (
+        ('regions', 'region'),
+        ('top_products', 'product'),
+        ('top_customers', 'customer'),
+        ('daily_trend', 'date'),
+        ('low_products', 'product')
+    ):
+        for entry in report[section]:
+            for field, value in entry.items():
+                if field != item_key:
+                    writer.writerow([section, entry[item_key], field, value])
+
+    if report['peak_day']:
+        for field, value in report['peak_day'].items():
+            writer.writerow(['peak_day', '', field, value])
+
+    enrichment = report.get('enrichment')
+    if enrichment is not None:
+        writer.writerow(['enrichment', '', 'enriched', enrichment['enriched']])
+        writer.writerow(['enrichment', '', 'success_rate', enrichment['success_rate']])
+        for name in enrichment['not_enriched']:
+            writer.writerow(['enrichment', name, 'not_enriched', ''])
+
+    return buffer.getvalue()
+
+
+def _html_table(title, headers, rows):
+    parts = [f"<h2>{html.escape(title)}</h2>", "<table>", "<tr>"]
+    parts.extend(f"<th>{html.escape(header)}</th>" for header in headers)
+    parts.append("</tr>")
+    for row in rows:
+        parts.append("<tr>")
+        parts.extend(f"<td>{html.escape(str(value))}</td>" for value in row)
+        parts.append("</tr>")
+    parts.append("</table>")
+    return "".join(parts)
+
+
+def _render_html(report):
+    summary = report['summary']
+    peak_day = report['peak_day']
+
+    parts = [
+        "<!DOCTYPE html>",
+        '<html><head><meta charset="utf-8"><title>Sales Analytics Report</title>',
+        "<style>body{font-family:sans-serif}table{border-collapse:collapse;margin-bottom:1em}"
+        "th,td{border:1px solid #ccc;padding:4px 8px;text-align:left}</style></head><body>",
+        "<h1>Sales Analytics Report</h1>",
+        f"<p>Generated: {html.escape(report['generated'])}</p>",
+        _html_table("Overall Summary", ["Metric", "Value"], [
+            ("Total Revenue", _money(summary['total_revenue'])),
+            ("Total Transactions", summary['total_transactions']),
+            ("Average Order Value", _money(summary['average_order_value'])),
+            ("Date Range", f"{summary['date_from']} to {summary['date_to']}"),
+            ("Best Selling Day", f"{peak_day['date']} ({_money(peak_day['revenue'])})" if peak_day else "N/A")
+        ]),
+        _html_table("Region-wise Performance", ["Region", "Sales", "Transactions", "Percentage"], [
+            (r['region'], _money(r['sales']), r['transactions'], f"{r['percentage']:.2f}%")
+            for r in report['regions']
+        ]),
+        _html_table("Top Products", ["#", "Product", "Quantity", "Revenue"], [
+            (i, p['product'], p['quantity'], _money(p['revenue']))
+            for i, p in enumerate(report['top_products'], 1)
+        ]),
+        _html_table("Top Customers", ["#", "Customer", "Spent", "Orders"], [
+            (i, c['customer'], _money(c['spent']), c['orders'])
+            for i, c in enumerate(report['top_customers'], 1)
+        ]),
+        _html_table("Daily Sales Trend", ["Date", "Revenue", "Transactions", "Unique Customers"], [
+            (d['date'], _money(d['revenue']), d['transactions'], d['unique_customers'])
+            for d in report['daily_trend']
+        ]),
+        _html_table("Low Performing Products", ["Product", "Quantity", "Revenue"], [
+            (p['product'], p['quantity'], _money(p['revenue']))
+            for p in report['low_products']
+        ])
+    ]
+
+    enrichment = report.get('enrichment')
+    if enrichment is not None:
+        parts.append(_html_table("API Enrichment Summary", ["Metric", "Value"], [
+            ("Total Enriched Successfully", enrichment['enriched']),
+            ("Success Rate", f"{enrichment['success_rate']:.2f}%"),
+            ("Products Not Enriched", ", ".join(enrichment['not_enriched']) or "-")
+        ]))
+
+    parts.append("</body></html>")
+    return "\n".join(parts) + "\n"
+
+
+RENDERERS = {
+    'text': _render_text,
+    'json': _render_json,
+    'csv': _render_csv,
+    'html': _render_html
+}
+
+
+def render_report(report, output_format='text'):
+    if output_format not in RENDERERS:
+        raise ValueError(f"Unknown report format: {output_format}")
+    return RENDERERS[output_format](report)
@@ -0,0 +1,372 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from utils.sketches import HyperLogLog, hll_precision, hll_slot
+from utils.transaction_table import TransactionTable
+
+
+PERIODS = ['day', 'week', 'month']
+
+
+def period_key(date, period):
+    if period == 'day':
+        return date
+
+    try:
+        day = datetime.strptime(date, '%Y-%m-%d').date()
+    except ValueError:
+        return date
+
+    if period == 'week':
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+    if period == 'month':
+        return f"{day.year}-{day.month:02d}"
+    raise ValueError(f"Unknown period: {period}")
+
+
+def _summary(entry):
+    # Distinct counts are estimated once per entry and kept until the entry
+    # is folded into again.
+    count = entry.get('unique_customers')
+    if count is None:
+        count = entry['unique_customers'] = len(entry['customers'])
+    return {
+        'revenue': entry['revenue'],
+        'quantity': entry['quantity'],
+        'transaction_count': entry['transaction_count'],
+        'unique_customers': count
+    }
+
+
+def _merge_customers(target, other):
+    if isinstance(target, HyperLogLog):
+        return target.merge(other)
+    target |= other
+    return target
+
+
+def _in_range(dates, start_date=None, end_date=None):
+    low = 0 if start_date is None else bisect_left(dates, start_date)
+    high = len(dates) if end_date is None else bisect_right(dates, end_date)
+    return low, max(low, high)
+
+
+class SalesCube:
+    # Precomputed aggregates per (Date, Region, ProductID) cell and per
+    # (Date, Region) day, Region None meaning all regions. Days and cells
+    # are indexed by region and by (region, product) with their dates kept
+    # sorted, so a query bisects its date range and sums the entries in it;
+    # week and month rollups are merged from the days on first use. Queries
+    # never touch raw rows.
+
+    def __init__(self, distinct='hll', customer_error=0.01, cell_error=0.1):
+        self.distinct = distinct
+        self.customer_error = customer_error
+        self.cell_error = cell_error
+        self._precision = {error: hll_precision(error) for error in (customer_error, cell_error)}
+
+        # region -> {date: day entry}; (region, product) -> {date: cell}
+        self.days = {}
+        self.cells = {}
+        self.product_regions = {}
+
+        # Sorted (dates, entries) per days/cells key, dropped when a new
+        # date is added under that key; period rollups, dropped on add().
+        self._sorted = {}
+        self._rollups = {}
+        self._totals = {}
+
+    def _new_entry(self, error):
+        customers = set() if self.distinct == 'exact' else HyperLogLog(precision=self._precision[error])
+        return {'revenue': 0.0, 'quantity': 0, 'transaction_count': 0, 'customers': customers}
+
+    def _day(self, date, region):
+        by_date = self.days.get(region)
+        if by_date is None:
+            by_date = self.days[region] = {}
+
+        entry = by_date.get(date)
+        if entry is None:
+            entry = by_date[date] = self._new_entry(self.customer_error)
+            self._sorted.pop(('day', region), None)
+        return entry
+
+    def _cell(self, date, region, product_id):
+        by_date = self.cells.get((region, product_id))
+        if by_date is None:
+            by_date = self.cells[(region, product_id)] = {}
+            self.product_regions.setdefault(product_id, []).append(region)
+
+        cell = by_date.get(date)
+        if cell is None:
+            cell = by_date[date] = self._new_entry(self.cell_error)
+            self._sorted.pop(('cell', region, product_id), None)
+        return cell
+
+    def add(self, transactions):
+        # Folds rows in input order, so day revenue for a region (or for all
+        # regions) equals daily_sales_trend over the same rows exactly.
+        if not isinstance(transactions, TransactionTable):
+            transactions = TransactionTable.from_records(transactions)
+
+        if len(transactions):
+            if np is not None:
+                self._add_grouped(transactions)
+            else:
+                self._add_rows(transactions)
+
+        self._rollups = {}
+        self._totals = {}
+        return self
+
+    def _add_rows(self, transactions):
+        dictionaries = transactions.dictionaries
+        dates = dictionaries['Date']
+        regions = dictionaries['Region']
+        product_ids = dictionaries['ProductID']
+        customer_ids = dictionaries['CustomerID']
+        codes = transactions.codes
+
+        rows = zip(
+            transactions.quantity, transactions.unit_price, codes['Date'],
+            codes['Region'], codes['ProductID'], codes['CustomerID']
+        )
+
+        for quantity, unit_price, dc, rc, pc, cc in rows:
+            amount = quantity * unit_price
+            date = dates[dc]
+            region = regions[rc]
+            customer = customer_ids[cc]
+
+            entries = (
+                self._cell(date, region, product_ids[pc]),
+                self._day(date, region),
+                self._day(date, None)
+            )
+            for entry in entries:
+                entry['revenue'] += amount
+                entry['quantity'] += quantity
+                entry['transaction_count'] += 1
+                entry['customers'].add(customer)
+                entry['unique_customers'] = None
+
+    def _add_grouped(self, transactions):
+        # Rows are grouped by code with numpy and summed with bincount, which
+        # adds each group's values in row order just like the row loop.
+        dictionaries = transactions.dictionaries
+        dates = dictionaries['Date']
+        regions = dictionaries['Region']
+        product_ids = dictionaries['ProductID']
+        codes = transactions.codes
+
+        date_codes = np.frombuffer(codes['Date'], dtype='I').astype(np.int64)
+        region_codes = np.frombuffer(codes['Region'], dtype='I').astype(np.int64)
+        product_codes = np.frombuffer(codes['ProductID'], dtype='I').astype(np.int64)
+        quantity = np.frombuffer(transactions.quantity, dtype='q')
+        amount = quantity * np.frombuffer(transactions.unit_price, dtype='d')
+        region_count = len(regions)
+        product_count = len(product_ids)
+
+        keys, groups = np.unique(
+            (date_codes * region_count + region_codes) * product_count + product_codes, return_inverse=True
+        )
+        entries = [
+            self._cell(dates[key // (region_count * product_count)],
+                       regions[key // product_count % region_count], product_ids[key % product_count])
+            for key in keys.tolist()
+        ]
+        self._fold_groups(entries, groups, transactions, amount, quantity, self.cell_error)
+
+        keys, groups = np.unique(date_codes * region_count + region_codes, return_inverse=True)
+        entries = [self._day(dates[key // region_count], regions[key % region_count]) for key in keys.tolist()]
+        self._fold_groups(entries, groups, transactions, amount, quantity, self.customer_error)
+
+        keys, groups = np.unique(date_codes, return_inverse=True)
+        entries = [self._day(dates[key], None) for key in keys.tolist()]
+        self._fold_groups(entries, groups, transactions, amount, quantity, self.customer_error)
+
+    def _fold_groups(self, entries, groups, transactions, amount, quantity, error):
+        count = len(entries)
+        groups = groups.reshape(-1)
+        new_entries = [entry['transaction_count'] == 0 for entry in entries]
+
+        # Each entry's current revenue goes first so it is the start of the
+        # fold, as if the new rows were added to it one by one.
+        revenue = np.bincount(
+            np.concatenate([np.arange(count), groups]),
+            weights=np.concatenate([np.array([entry['revenue'] for entry in entries], dtype='d'), amount]),
+            minlength=count
+        )
+        quantities = np.bincount(groups, weights=quantity, minlength=count)
+        row_counts = np.bincount(groups, minlength=count)
+
+        for entry, group_revenue, group_quantity, group_rows in zip(
+            entries, revenue.tolist(), quantities.tolist(), row_counts.tolist()
+        ):
+            entry['revenue'] = group_revenue
+            entry['quantity'] += int(group_quantity)
+            entry['transaction_count'] += group_rows
+            entry['unique_customers'] = None
+
+        # Each (group, customer) pair once.
+        customer_ids = transactions.dictionaries['CustomerID']
+        customer_codes = np.frombuffer(transactions.codes['CustomerID'], dtype='I').astype(np.int64)
+        pairs = np.unique(groups * len(customer_ids) + customer_codes)
+        pair_groups = pairs // len(customer_ids)
+        pair_customers = pairs % len(customer_ids)
+
+        if self.distinct == 'exact':
+            for group, customer in zip(pair_groups.tolist(), pair_customers.tolist()):
+                entries[group]['customers'].add(customer_ids[customer])
+            return
+
+        # Register updates for all groups at once; new entries take their
+        # registers as they are, existing ones merge them.
+        p = self._precision[error]
+        present, positions = np.unique(pair_customers, return_inverse=True)
+        slots = np.array([hll_slot(customer_ids[code], p) for code in present.tolist()], dtype=np.int64)
+        slots = slots.reshape(-1, 2)[positions.reshape(-1)]
+
+        registers = np.zeros((count, 1 << p), dtype=np.uint8)
+        np.maximum.at(registers, (pair_groups, slots[:, 0]), slots[:, 1].astype(np.uint8))
+
+        sketch = HyperLogLog(precision=p)
+        for entry, is_new, group_registers in zip(entries, new_entries, registers):
+            if is_new:
+                entry['customers'].registers = bytearray(group_registers)
+            else:
+                sketch.registers[:] = group_registers.tobytes()
+                entry['customers'].merge(sketch)
+
+    def _sorted_entries(self, kind, key):
+        cache_key = (kind,) + key
+        pair = self._sorted.get(cache_key)
+        if pair is None:
+            by_date = self.days.get(key[0], {}) if kind == 'day' else self.cells.get(key, {})
+            dates = sorted(by_date)
+            pair = self._sorted[cache_key] = (dates, [by_date[date] for date in dates])
+        return pair
+
+    def _day_range(self, region=None, start_date=None, end_date=None):
+        dates, entries = self._sorted_entries('day', (region,))
+        low, high = _in_range(dates, start_date, end_date)
+        return dates[low:high], entries[low:high]
+
+    def _cell_range(self, region, product_id, start_date=None, end_date=None):
+        dates, entries = self._sorted_entries('cell', (region, product_id))
+        low, high = _in_range(dates, start_date, end_date)
+        return entries[low:high]
+
+    def _roll_up(self, period, dates, entries):
+        merged = {}
+        for date, entry in zip(dates, entries):
+            key = period_key(date, period)
+            rolled = merged.get(key)
+            if rolled is None:
+                merged[key] = dict(entry, customers=entry['customers'].copy())
+            else:
+                rolled['revenue'] += entry['revenue']
+                rolled['quantity'] += entry['quantity']
+                rolled['transaction_count'] += entry['transaction_count']
+                _merge_customers(rolled['customers'], entry['customers'])
+                rolled['unique_customers'] = None
+        return merged
+
+    def _period_entries(self, period, region=None, start_date=None, end_date=None):
+        # (period key, entry) pairs in date order.
+        if period not in PERIODS:
+            raise ValueError(f"Unknown period: {period}")
+
+        if period == 'day':
+            return zip(*self._day_range(region, start_date, end_date))
+
+        if start_date is None and end_date is None:
+            rollup = self._rollups.get((period, region))
+            if rollup is None:
+                rollup = self._rollups[(period, region)] = self._roll_up(period, *self._day_range(region))
+        else:
+            rollup = self._roll_up(period, *self._day_range(region, start_date, end_date))
+        return rollup.items()
+
+    def trend(self, period='day', region=None, start_date=None, end_date=None):
+        return {
+            key: _summary(entry)
+            for key, entry in self._period_entries(period, region, start_date, end_date)
+        }
+
+    def peak(self, period='day', region=None, start_date=None, end_date=None):
+        # Same tie rule as find_peak_sales_day: earliest period wins.
+        peak_key = None
+        peak_revenue = 0.0
+        peak_transactions = 0
+
+        for key, entry in self._period_entries(period, region, start_date, end_date):
+            if entry['revenue'] > peak_revenue:
+                peak_key = key
+                peak_revenue = entry['revenue']
+                peak_transactions = entry['transaction_count']
+
+        return peak_key, peak_revenue, peak_transactions
+
+    def region_sales(self, start_date=None, end_date=None, region=None):
+        totals = {}
+
+        for cell_region in self.days:
+            if cell_region is None or (region is not None and cell_region != region):
+                continue
+
+            entries = self._day_range(cell_region, start_date, end_date)[1]
+            if entries:
+                totals[cell_region] = {
+                    'total_sales': math.fsum(entry['revenue'] for entry in entries),
+                    'transaction_count': sum(entry['transaction_count'] for entry in entries)
+                }
+
+        return dict(sorted(totals.items(), key=lambda x: x[1]['total_sales'], reverse=True))
+
+    def query(self, region=None, product_id=None, start_date=None, end_date=None):
+        # Whole-range answers are kept until the next add().
+        whole_range = start_date is None and end_date is None
+        if whole_range and (region, product_id) in self._totals:
+            return dict(self._totals[(region, product_id)])
+
+        if product_id is None:
+            entries = self._day_range(region, start_date, end_date)[1]
+        else:
+            entries = []
+            for cell_region in self.product_regions.get(product_id, ()):
+                if region is None or cell_region == region:
+                    entries += self._cell_range(cell_region, product_id, start_date, end_date)
+
+        customers = None
+        for entry in entries:
+            if customers is None:
+                customers = entry['customers'].copy()
+            else:
+                _merge_customers(customers, entry['customers'])
+
+        result = {
+            'revenue': math.fsum(entry['revenue'] for entry in entries),
+            'quantity': sum(entry['quantity'] for entry in entries),
+            'transaction_count': sum(entry['transaction_count'] for entry in entries),
+            'unique_customers': len(customers) if customers is not None else 0
+        }
+
+        if whole_range:
+            self._totals[(region, product_id)] = dict(result)
+        return result
+
+
+def build_sales_cube(transactions, distinct='hll', customer_error=0.01, cell_error=0.1):
+    # Cells get coarse customer sketches (cell_error) to stay small; days
+    # use customer_error, and weeks and months are merged from the days.
+    # distinct='exact' keeps customer sets instead, matching aggregate_sales
+    # in that mode.
+    return SalesCube(distinct, customer_error, cell_error).add(transactions)
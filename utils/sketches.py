@@ -0,0 +1,157 @@
+import base64
+from functools import lru_cache
+import hashlib
+import heapq
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def top_k(items, k, key):
+    # Same result as sorted(items, key=key, reverse=True)[:k], ties kept in
+    # input order, in O(n log k) time and O(k) memory.
+    return heapq.nlargest(k, items, key=key)
+
+
+class SpaceSaving:
+    # Space-Saving heavy-hitter sketch for approximate top-N over an
+    # unbounded stream in fixed memory. Any item whose true weight is
+    # above total / capacity is guaranteed to be tracked; each estimate
+    # overcounts by at most its recorded error.
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.total = 0
+        self.counts = {}
+        self.errors = {}
+        self._heap = []
+
+    def update(self, item, weight=1):
+        self.total += weight
+        counts = self.counts
+
+        if item in counts:
+            counts[item] += weight
+        elif len(counts) < self.capacity:
+            counts[item] = weight
+            self.errors[item] = 0
+        else:
+            # Evict the item with the smallest count; the newcomer inherits
+            # that count as its possible overestimate.
+            minimum, victim = self._pop_min()
+            del counts[victim]
+            del self.errors[victim]
+            counts[item] = minimum + weight
+            self.errors[item] = minimum
+
+        heapq.heappush(self._heap, (counts[item], item))
+
+        # Heap entries go stale as counts grow; compact now and then.
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(count, key) for key, count in counts.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self):
+        while True:
+            count, item = heapq.heappop(self._heap)
+            if self.counts.get(item) == count:
+                return count, item
+
+    def top(self, n):
+        # [(item, estimated_weight, max_overcount), ...], heaviest first.
+        best = top_k(self.counts.items(), n, key=lambda x: x[1])
+        return [(item, count, self.errors[item]) for item, count in best]
+
+
+@lru_cache(maxsize=1 << 16)
+def _hash64(value):
+    # Stable across processes and runs (unlike hash()), so sketches built
+    # elsewhere or saved earlier can be merged.
+    digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def hll_slot(value, p):
+    # Register index and rank that a HyperLogLog of precision p gives value.
+    x = _hash64(value)
+    rest = x & ((1 << (64 - p)) - 1)
+    return x >> (64 - p), (64 - p) - rest.bit_length() + 1
+
+
+def hll_precision(error):
+    # Standard error of HyperLogLog is about 1.04 / sqrt(2 ** p).
+    p = math.ceil(math.log2((1.04 / error) ** 2))
+    return min(18, max(4, p))
+
+
+class HyperLogLog:
+    # Approximate distinct counter in fixed memory (2 ** p one-byte
+    # registers). Sketches with the same precision merge losslessly, so
+    # daily counts roll up into weekly or monthly ones.
+
+    def __init__(self, error=0.01, precision=None):
+        self.p = precision if precision is not None else hll_precision(error)
+        self.m = 1 << self.p
+        self.registers = bytearray(self.m)
+
+    def add(self, value):
+        index, rank = hll_slot(value, self.p)
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        m = self.m
+        if m == 16:
+            alpha = 0.673
+        elif m == 32:
+            alpha = 0.697
+        elif m == 64:
+            alpha = 0.709
+        else:
+            alpha = 0.7213 / (1 + 1.079 / m)
+
+        # Registers only hold ranks 0..64, so count each rank with a C-level
+        # scan instead of summing register by register.
+        registers = self.registers
+        if np is not None:
+            histogram = np.bincount(np.frombuffer(registers, dtype=np.uint8), minlength=66 - self.p).tolist()
+        else:
+            histogram = [registers.count(rank) for rank in range(66 - self.p)]
+        estimate = alpha * m * m / sum(n * 2.0 ** -rank for rank, n in enumerate(histogram))
+
+        # Small cardinalities: linear counting is more accurate.
+        zeros = histogram[0]
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+
+        return estimate
+
+    def __len__(self):
+        return int(round(self.count()))
+
+    def merge(self, other):
+        if other.p != self.p:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        if np is not None:
+            registers = np.frombuffer(self.registers, dtype=np.uint8)
+            np.maximum(registers, np.frombuffer(other.registers, dtype=np.uint8), out=registers)
+        else:
+            self.registers[:] = bytes(map(max, self.registers, other.registers))
+        return self
+
+    def copy(self):
+        sketch = HyperLogLog(precision=self.p)
+        sketch.registers[:] = self.registers
+        return sketch
+
+    def to_json(self):
+        return {'hll': self.p, 'registers': base64.b64encode(bytes(self.registers)).decode('ascii')}
+
+    @classmethod
+    def from_json(cls, state):
+        sketch = cls(precision=state['hll'])
+        sketch.registers[:] = base64.b64decode(state['registers'])
+        return sketch
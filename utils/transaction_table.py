@@ -0,0 +1,395 @@
+from array import array
+import json
+import mmap
+import os
+import sys
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+FIELDS = [
+    'TransactionID', 'Date', 'ProductID', 'ProductName',
+    'Quantity', 'UnitPrice', 'CustomerID', 'Region'
+]
+
+# Repeated string columns are stored as uint32 codes into a per-column
+# dictionary of distinct values.
+CODED_COLUMNS = ['Date', 'ProductID', 'ProductName', 'CustomerID', 'Region']
+
+
+def _gather(column, indices):
+    if np is not None and isinstance(indices, np.ndarray):
+        selected = np.frombuffer(column, dtype=column.typecode)[indices]
+        result = array(column.typecode)
+        result.frombytes(selected.tobytes())
+        return result
+
+    return array(column.typecode, [column[i] for i in indices])
+
+
+class TransactionTable:
+    def __init__(self, dictionaries=None, index=None):
+        self.transaction_ids = []
+        self.codes = {name: array('I') for name in CODED_COLUMNS}
+        self.quantity = array('q')
+        self.unit_price = array('d')
+        self.amount = None
+
+        # name -> (key column, list of values indexed by the key's code)
+        self.lookups = {}
+
+        if dictionaries is None:
+            dictionaries = {name: [] for name in CODED_COLUMNS}
+        self.dictionaries = dictionaries
+
+        if index is None:
+            index = {
+                name: {value: code for code, value in enumerate(values)}
+                for name, values in dictionaries.items()
+            }
+        self._index = index
+
+    @classmethod
+    def from_records(cls, records):
+        table = cls()
+        amounts = array('d')
+
+        for tx in records:
+            table.append(tx)
+            if amounts is not None:
+                if 'Amount' in tx:
+                    amounts.append(tx['Amount'])
+                else:
+                    amounts = None
+
+        # Validated records carry Amount; keep it when every record has one.
+        if amounts is not None and len(table):
+            table.amount = amounts
+        return table
+
+    def encode(self, name, value):
+        index = self._index[name]
+        code = index.get(value)
+        if code is None:
+            code = len(self.dictionaries[name])
+            self.dictionaries[name].append(value)
+            index[value] = code
+        return code
+
+    def code_of(self, name, value):
+        return self._index[name].get(value)
+
+    def append_row(self, transaction_id, date, product_id, product_name,
+                   quantity, unit_price, customer_id, region):
+        # Quantity goes first: it is the only append that can fail
+        # (OverflowError), and nothing is half-written if it does.
+        self.quantity.append(quantity)
+        self.unit_price.append(unit_price)
+        self.transaction_ids.append(transaction_id)
+
+        codes = self.codes
+        codes['Date'].append(self.encode('Date', date))
+        codes['ProductID'].append(self.encode('ProductID', product_id))
+        codes['ProductName'].append(self.encode('ProductName', product_name))
+        codes['CustomerID'].append(self.encode('CustomerID', customer_id))
+        codes['Region'].append(self.encode('Region', region))
+
+    def append_encoded(self, transaction_id, quantity, unit_price, date_code,
+                       product_code, name_code, customer_code, region_code):
+        # Same as append_row for callers that already hold dictionary codes.
+        self.quantity.append(quantity)
+        self.unit_price.append(unit_price)
+        self.transaction_ids.append(transaction_id)
+
+        codes = self.codes
+        codes['Date'].append(date_code)
+        codes['ProductID'].append(product_code)
+        codes['ProductName'].append(name_code)
+        codes['CustomerID'].append(customer_code)
+        codes['Region'].append(region_code)
+
+    def append(self, tx):
+        self.append_row(*(tx[name] for name in FIELDS))
+
+    def extend(self, other):
+        # Append another table's rows, translating its codes into this
+        # table's dictionaries.
+        self.transaction_ids.extend(other.transaction_ids)
+        self.quantity.extend(other.quantity)
+        self.unit_price.extend(other.unit_price)
+        if self.amount is not None:
+            if other.amount is not None:
+                self.amount.extend(other.amount)
+            else:
+                self.amount.extend(q * p for q, p in zip(other.quantity, other.unit_price))
+
+        for name, codes in other.codes.items():
+            if other.dictionaries is self.dictionaries:
+                self.codes[name].extend(codes)
+                continue
+
+            translate = [self.encode(name, value) for value in other.dictionaries[name]]
+            if np is not None and translate:
+                translated = np.array(translate, dtype='I')[np.frombuffer(codes, dtype='I')]
+                self.codes[name].frombytes(translated.tobytes())
+            else:
+                self.codes[name].extend(array('I', [translate[code] for code in codes]))
+
+    def __getstate__(self):
+        # The value -> code index is rebuilt on load rather than pickled,
+        # which keeps tables cheap to send between processes.
+        state = self.__dict__.copy()
+        del state['_index']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._index = {
+            name: {value: code for code, value in enumerate(values)}
+            for name, values in self.dictionaries.items()
+        }
+
+    def __len__(self):
+        return len(self.transaction_ids)
+
+    def column(self, name):
+        if name == 'TransactionID':
+            return self.transaction_ids
+        if name == 'Quantity':
+            return self.quantity
+        if name == 'UnitPrice':
+            return self.unit_price
+        if name == 'Amount':
+            return self.amount
+        if name in self.codes:
+            values = self.dictionaries[name]
+            return [values[code] for code in self.codes[name]]
+        if name in self.lookups:
+            key, values = self.lookups[name]
+            return [values[code] for code in self.codes[key]]
+        raise KeyError(name)
+
+    def add_lookup_column(self, name, key, values):
+        # Attach a column whose value depends only on another coded column,
+        # e.g. API attributes per ProductID, without storing it per row.
+        self.lookups[name] = (key, values)
+
+    def copy(self):
+        # Shallow copy: columns are shared, lookup columns can be added to
+        # the copy without touching this table.
+        table = TransactionTable(self.dictionaries, self._index)
+        table.transaction_ids = self.transaction_ids
+        table.codes = self.codes
+        table.quantity = self.quantity
+        table.unit_price = self.unit_price
+        table.amount = self.amount
+        table.lookups = dict(self.lookups)
+        return table
+
+    def take(self, indices):
+        # New table over the selected rows. Dictionaries and lookup columns
+        # are shared, so codes stay comparable between the two tables.
+        table = TransactionTable(self.dictionaries, self._index)
+        table.lookups = dict(self.lookups)
+
+        ids = self.transaction_ids
+        table.transaction_ids = [ids[i] for i in indices]
+
+        table.quantity = _gather(self.quantity, indices)
+        table.unit_price = _gather(self.unit_price, indices)
+        for name, codes in self.codes.items():
+            table.codes[name] = _gather(codes, indices)
+        if self.amount is not None:
+            table.amount = _gather(self.amount, indices)
+
+        return table
+
+    def row(self, i):
+        dictionaries = self.dictionaries
+        codes = self.codes
+
+        tx = {
+            'TransactionID': self.transaction_ids[i],
+            'Date': dictionaries['Date'][codes['Date'][i]],
+            'ProductID': dictionaries['ProductID'][codes['ProductID'][i]],
+            'ProductName': dictionaries['ProductName'][codes['ProductName'][i]],
+            'Quantity': self.quantity[i],
+            'UnitPrice': self.unit_price[i],
+            'CustomerID': dictionaries['CustomerID'][codes['CustomerID'][i]],
+            'Region': dictionaries['Region'][codes['Region'][i]]
+        }
+
+        if self.amount is not None:
+            tx['Amount'] = self.amount[i]
+
+        for name, (key, values) in self.lookups.items():
+            tx[name] = values[codes[key][i]]
+
+        return tx
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('row index out of range')
+        return self.row(i)
+
+    def __iter__(self):
+        # Rows are materialised one at a time and not kept.
+        for i in range(len(self)):
+            yield self.row(i)
+
+
+TABLE_FORMAT_VERSION = 1
+
+
+def _column_files(table):
+    files = {
+        'Quantity': table.quantity,
+        'UnitPrice': table.unit_price
+    }
+    if table.amount is not None:
+        files['Amount'] = table.amount
+    for name, codes in table.codes.items():
+        files[name] = codes
+    return files
+
+
+def save_table(table, directory, metadata=None):
+    # One raw native-endian file per column plus a JSON manifest holding
+    # the dictionaries and the per-code values of lookup columns.
+    os.makedirs(directory, exist_ok=True)
+
+    columns = {}
+    for name, column in _column_files(table).items():
+        with open(os.path.join(directory, name + '.bin'), 'wb') as file:
+            column.tofile(file)
+        columns[name] = column.typecode
+
+    with open(os.path.join(directory, 'TransactionID.txt'), 'w', encoding='utf-8') as file:
+        file.write('\n'.join(table.transaction_ids))
+
+    manifest = {
+        'version': TABLE_FORMAT_VERSION,
+        'byteorder': sys.byteorder,
+        'rows': len(table),
+        'columns': columns,
+        'dictionaries': table.dictionaries,
+        'lookups': {
+            name: {'key': key, 'values': values}
+            for name, (key, values) in table.lookups.items()
+        },
+        'metadata': metadata or {}
+    }
+
+    with open(os.path.join(directory, 'manifest.json'), 'w', encoding='utf-8') as file:
+        json.dump(manifest, file)
+
+
+def read_manifest(directory):
+    with open(os.path.join(directory, 'manifest.json'), encoding='utf-8') as file:
+        manifest = json.load(file)
+
+    if manifest.get('version') != TABLE_FORMAT_VERSION or manifest.get('byteorder') != sys.byteorder:
+        raise ValueError(f"Unsupported table format in {directory}")
+
+    return manifest
+
+
+def load_table(directory):
+    manifest = read_manifest(directory)
+    rows = manifest['rows']
+
+    table = TransactionTable(manifest['dictionaries'])
+
+    columns = {}
+    for name, typecode in manifest['columns'].items():
+        column = array(typecode)
+        with open(os.path.join(directory, name + '.bin'), 'rb') as file:
+            column.fromfile(file, rows)
+        columns[name] = column
+
+    table.quantity = columns['Quantity']
+    table.unit_price = columns['UnitPrice']
+    table.amount = columns.get('Amount')
+    for name in table.codes:
+        table.codes[name] = columns[name]
+
+    for name, lookup in manifest.get('lookups', {}).items():
+        table.add_lookup_column(name, lookup['key'], lookup['values'])
+
+    table.transaction_ids = _read_transaction_ids(directory, rows)
+
+    return table
+
+
+def _read_transaction_ids(directory, rows):
+    with open(os.path.join(directory, 'TransactionID.txt'), encoding='utf-8') as file:
+        text = file.read()
+    return text.split('\n') if rows else []
+
+
+class EncodedColumn:
+    # Read-only view of a dictionary-encoded column: per-row codes plus the
+    # distinct values they index.
+    def __init__(self, codes, values):
+        self.codes = codes
+        self.values = values
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        return self.values[self.codes[i]]
+
+    def __iter__(self):
+        values = self.values
+        for code in self.codes:
+            yield values[code]
+
+
+def _map_column(path, typecode, rows):
+    if rows == 0:
+        return memoryview(array(typecode))
+
+    with open(path, 'rb') as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mapped).cast(typecode)
+
+
+def open_columns(directory, columns=None):
+    # Memory-maps only the requested columns of a saved table. Numeric
+    # columns come back as typed memoryviews (usable with numpy.frombuffer
+    # without a copy), coded and lookup columns as EncodedColumn views.
+    manifest = read_manifest(directory)
+    rows = manifest['rows']
+    lookups = manifest.get('lookups', {})
+
+    if columns is None:
+        columns = ['TransactionID'] + list(manifest['columns']) + list(lookups)
+
+    mapped = {}
+
+    def codes_of(name):
+        if name not in mapped:
+            path = os.path.join(directory, name + '.bin')
+            mapped[name] = _map_column(path, manifest['columns'][name], rows)
+        return mapped[name]
+
+    result = {}
+    for name in columns:
+        if name == 'TransactionID':
+            result[name] = _read_transaction_ids(directory, rows)
+        elif name in manifest['dictionaries']:
+            result[name] = EncodedColumn(codes_of(name), manifest['dictionaries'][name])
+        elif name in manifest['columns']:
+            result[name] = codes_of(name)
+        elif name in lookups:
+            result[name] = EncodedColumn(codes_of(lookups[name]['key']), lookups[name]['values'])
+        else:
+            raise KeyError(name)
+
+    return result